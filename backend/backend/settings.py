@@ -10,9 +10,12 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
+from datetime import timedelta
+from importlib.util import find_spec
 from pathlib import Path
 import dj_database_url
 import os
+import tempfile
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -47,15 +50,18 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'inventory.middleware.PerformanceMiddleware',
+    'inventory.middleware.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'inventory.middleware.ShopMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     "corsheaders.middleware.CorsMiddleware",
-    "whitenoise.middleware.WhiteNoiseMiddleware",
+    "inventory.middleware.StaticFilesMiddleware",
 
 ]
 
@@ -95,7 +101,7 @@ WSGI_APPLICATION = 'backend.wsgi.application'
 DATABASES = {
     'default': dj_database_url.config(
         default=os.getenv('DATABASE_URL', 'sqlite:///' + str(BASE_DIR / 'db.sqlite3')),
-        conn_max_age=600
+        conn_max_age=int(os.getenv('DB_CONN_MAX_AGE', 600))
     )
 }
 
@@ -107,6 +113,34 @@ DATABASES = {
 
 # }
 
+# Caches
+# 'default' is local memory, private to each process. What other processes
+# must be able to invalidate lives in 'shared': user roles and token
+# revocations. 'shared' is Redis when REDIS_URL is set, else a file cache
+# seen by every process on this host; deployments with several hosts need
+# REDIS_URL.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('REDIS_URL'),
+    } if os.getenv('REDIS_URL') else {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv('CACHE_DIR', os.path.join(tempfile.gettempdir(), 'inventory-cache')),
+    },
+}
+
+# Rendered catalogs (inventory/utils/catalog_cache.py) are keyed by the shop's
+# catalog version, kept in the database, so they can stay per process
+CATALOG_CACHE_ALIAS = 'default'
+CATALOG_CACHE_TIMEOUT = 300  # seconds
+
+# User role (group name) lookups, see inventory/utils/roles.py
+ROLE_CACHE_ALIAS = 'shared'
+ROLE_CACHE_TIMEOUT = 300  # seconds
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -151,7 +185,61 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        "rest_framework.authentication.TokenAuthentication",
+        "inventory.authentication.CachedTokenAuthentication",
         
        
-    ]}
\ No newline at end of file
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'inventory.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ]}
+
+# JSON is encoded with orjson when it is installed (pip install orjson);
+# set FAST_JSON = False to always use DRF's stdlib encoder
+FAST_JSON = True
+
+# Response compression (inventory/middleware.py CompressionMiddleware):
+# brotli when the brotli package is installed and accepted, else gzip
+COMPRESSION_MIN_SIZE = 1024  # bytes
+COMPRESSION_BROTLI_QUALITY = 5
+
+# Audit log entries are written in batches by a background thread
+# (see inventory/utils/audit_sink.py) so requests never wait on audit I/O.
+AUDIT_LOG_ASYNC = True
+AUDIT_LOG_BATCH_SIZE = 200
+AUDIT_LOG_FLUSH_INTERVAL = 2.0  # seconds
+AUDIT_LOG_SPILL_PATH = BASE_DIR / 'audit_spill.ndjson'
+AUDIT_LOG_QUARANTINE_PATH = BASE_DIR / 'audit_quarantine.ndjson'  # entries the database rejected
+
+# Token authentication cache and sliding expiry (inventory/authentication.py)
+AUTH_TOKEN_CACHE_SIZE = 10000
+AUTH_TOKEN_CACHE_TTL = 60  # seconds
+# Logouts, password and role changes reach the token caches of other workers
+# through this cache, so it must be shared
+AUTH_TOKEN_REVOCATION_CACHE_ALIAS = 'shared'
+AUTH_TOKEN_IDLE_TIMEOUT = timedelta(days=7)
+AUTH_TOKEN_TOUCH_INTERVAL = timedelta(minutes=5)
+
+# Request metrics (inventory/middleware.py PerformanceMiddleware), served in
+# Prometheus format at /metrics to scrapers sending "Authorization: Bearer
+# <METRICS_TOKEN>". Without a token /metrics is a 404 unless DEBUG is on.
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+PERF_SLOW_REQUEST_THRESHOLD = 1.0  # seconds
+PERF_SLOW_REQUEST_SAMPLE_RATE = 0.1  # share of requests whose SQL is kept for the slow log
+
+# Serve the read-heavy endpoints (products, sales counts, shop info, audit
+# logs) from the async views in inventory/async_views.py. Turn on when running
+# under an ASGI server, see Procfile.asgi.
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS') == '1'
+
+# Live updates streamed at /api/live/ (inventory/utils/live.py). LocalBroker
+# only reaches clients of the same process; when REDIS_URL is set events go
+# through Redis pub/sub so the clients of every worker get them.
+LIVE_EVENTS_REDIS_URL = os.getenv('REDIS_URL')
+LIVE_EVENTS_BROKER = os.getenv('LIVE_EVENTS_BROKER') or (
+    'inventory.utils.live.RedisBroker' if LIVE_EVENTS_REDIS_URL and find_spec('redis')
+    else 'inventory.utils.live.LocalBroker'
+)
+LIVE_EVENTS_QUEUE_SIZE = 100  # events a slow client may fall behind before it is told to resync
+LIVE_STREAM_HEARTBEAT = 15  # seconds
+LIVE_STREAM_MAX_AGE = 300  # seconds before a stream closes and the client reconnects
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Product, Sale, Category, StockAlert, Shop, AuditLog
+from .models import Product, Sale, Category, StockAlert, Shop, AuditLog, DailySalesRollup, ProductTombstone, ReplenishmentSuggestion, CatalogVersion
 # Register your models here.
 
 
@@ -11,4 +11,8 @@ class CategoryAdmin(admin.ModelAdmin):
 
 admin.site.register(StockAlert)
 admin.site.register(Shop)
-admin.site.register(AuditLog)
\ No newline at end of file
+admin.site.register(AuditLog)
+admin.site.register(DailySalesRollup)
+admin.site.register(ProductTombstone)
+admin.site.register(ReplenishmentSuggestion)
+admin.site.register(CatalogVersion)
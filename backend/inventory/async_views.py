@@ -0,0 +1,134 @@
+import functools
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.request import Request
+from rest_framework.views import exception_handler
+from .authentication import CachedTokenAuthentication
+from .models import AuditLog, Product
+from .pagination import akeyset_page
+from .permissions import IsManager
+from .renderers import dumps
+from .serializers import audit_log_dicts, audit_log_values, product_dicts, product_values
+from .utils import catalog_cache, live
+from .utils.audit_logger import alog_action
+from .utils.rollups import asales_totals
+from .utils.shops import resolve_shop
+from .views import (
+    catalog_fields, catalog_not_modified, catalog_response, catalog_variant, catalog_view_details,
+    filter_audit_logs, render_catalog,
+)
+
+# Async versions of the read-heavy views, routed instead of the sync ones
+# when ASYNC_VIEWS is on (see Procfile.asgi). Under an ASGI server a request
+# waiting on the database then holds no worker thread, so one process can
+# keep thousands of idle dashboard connections open. Responses match the
+# sync views field for field.
+
+
+def json_response(data, status=200, headers=None):
+    return HttpResponse(dumps(data), status=status, content_type="application/json", headers=headers)
+
+
+def prepare(request, permissions, needs_shop):
+    # What @api_view does before a view runs: token authentication (free on
+    # a token cache hit), permission checks and request.shop
+    drf_request = Request(request, authenticators=[CachedTokenAuthentication()])
+    drf_request.user
+    for permission in permissions:
+        if not permission().has_permission(drf_request, None):
+            if drf_request.successful_authenticator is None:
+                raise exceptions.NotAuthenticated()
+            raise exceptions.PermissionDenied()
+    if needs_shop:
+        request.shop = resolve_shop(drf_request)
+    return drf_request
+
+
+def async_api_view(methods, permissions=(), needs_shop=True):
+    # @api_view cannot wrap coroutines. Errors go through DRF's exception
+    # handler, so they get the same responses as on the sync views.
+    def decorator(view):
+        @csrf_exempt
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in methods:
+                return json_response({"detail": f'Method "{request.method}" not allowed.'}, status=405,
+                                     headers={"Allow": ", ".join(methods)})
+            try:
+                drf_request = await sync_to_async(prepare)(request, permissions, needs_shop)
+                return await view(drf_request, *args, **kwargs)
+            except Exception as exc:
+                if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+                    # As APIView.handle_exception does for token auth
+                    exc.status_code = 401
+                    exc.auth_header = CachedTokenAuthentication().authenticate_header(request)
+                response = exception_handler(exc, {"request": request})
+                if response is None:
+                    raise
+                headers = {name: response[name] for name in ("WWW-Authenticate", "Retry-After") if name in response}
+                return json_response(response.data, status=response.status_code, headers=headers)
+        return wrapper
+    return decorator
+
+
+@async_api_view(["GET"], [IsAuthenticated])
+async def listProducts(request):
+    shop = request.shop
+    version, variant, etag = await sync_to_async(catalog_variant)(request, shop)
+
+    if catalog_cache.matches(request, etag):
+        await alog_action(request, action='VIEW', shop=shop, model='Product',
+                          details={**catalog_view_details(request, shop), 'not_modified': True})
+        return catalog_not_modified(etag)
+
+    cached = await sync_to_async(catalog_cache.load)(shop.id, version, variant)
+    if cached is None:
+        if 'page' in request.query_params:
+            cached = await sync_to_async(render_catalog)(request, shop)
+        else:
+            products = product_values(Product.objects.filter(shop=shop).order_by('id'))
+            data = product_dicts([row async for row in products], catalog_fields(request))
+            cached = (len(data), dumps(data))
+        await sync_to_async(catalog_cache.store)(shop.id, version, variant, cached)
+
+    count, content = cached
+    await alog_action(request, action='VIEW', shop=shop, model='Product',
+                      details={**catalog_view_details(request, shop), 'product_count': count})
+    return catalog_response(content, etag)
+
+
+@async_api_view(["GET"])
+async def salesCount(request):
+    return json_response(await asales_totals(request.shop))
+
+
+@async_api_view(["GET"], [IsAuthenticated])
+async def getShopInfo(request):
+    shop = request.shop
+    return json_response({"shop_id": shop.id, "shop_name": shop.name})
+
+
+@async_api_view(["GET"], [IsAuthenticated, IsManager], needs_shop=False)
+async def auditLogList(request):
+    logs = await sync_to_async(filter_audit_logs)(request, audit_log_values(AuditLog.objects.all()))
+    logs, next_url = await akeyset_page(request, logs)
+    return json_response({"results": audit_log_dicts(logs), "next": next_url})
+
+
+# Server-sent events for the caller's shop: sale, product, product_deleted
+# and resync events (see inventory/utils/live.py). Only streamed under ASGI:
+# a sync worker would be held for the whole stream, so WSGI deployments get
+# 204 No Content and clients keep fetching. Streams end after
+# LIVE_STREAM_MAX_AGE and clients reconnect.
+@async_api_view(["GET"], [IsAuthenticated])
+async def liveEvents(request):
+    if not isinstance(request._request, ASGIRequest):
+        return HttpResponse(status=204)
+    response = StreamingHttpResponse(live.astream(request.shop.id), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # nginx would otherwise hold events back
+    return response
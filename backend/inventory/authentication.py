@@ -0,0 +1,149 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+from .utils.roles import user_roles
+from .utils.shops import owned_shops
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _revocations():
+    return caches[_setting('AUTH_TOKEN_REVOCATION_CACHE_ALIAS', 'default')]
+
+
+def _revocation_key(user_id):
+    return f"auth:{user_id}:revoked"
+
+
+def revoke_user(user_id):
+    # Drop the user's cached tokens here now, and in every other worker on
+    # their next request: entries remember the user's revocation stamp from
+    # the shared cache and are reloaded once it changes. The stamp is only
+    # written after commit, so no worker can reload the old state under it.
+    token_cache.pop_user(user_id)
+
+    def stamp():
+        _revocations().set(_revocation_key(user_id), time.time_ns(),
+                           timeout=_setting('AUTH_TOKEN_CACHE_TTL', 60))
+
+    transaction.on_commit(stamp)
+
+
+class TokenCacheEntry:
+    __slots__ = ('user', 'token', 'last_used', 'touched', 'expires', 'revoked')
+
+    def __init__(self, user, token, last_used, expires, revoked):
+        self.user = user
+        self.token = token
+        self.last_used = last_used
+        self.touched = last_used
+        self.expires = expires
+        self.revoked = revoked
+
+
+class TokenCache:
+    # Bounded, thread-safe LRU of token key -> TokenCacheEntry. Entries live
+    # for at most AUTH_TOKEN_CACHE_TTL seconds; revocations in other worker
+    # processes are seen sooner, see revoke_user().
+
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > _setting('AUTH_TOKEN_CACHE_SIZE', 10_000):
+                self.entries.popitem(last=False)
+
+    def pop(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def pop_user(self, user_id):
+        with self.lock:
+            for key in [k for k, e in self.entries.items() if e.user.pk == user_id]:
+                del self.entries[key]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    # TokenAuthentication that keeps token -> user (with roles and shops) in
+    # an in-process cache, so authenticated requests skip the Token + User
+    # join. Tokens also expire after AUTH_TOKEN_IDLE_TIMEOUT of inactivity;
+    # Token.created is reused as the "last used" time and is written back at
+    # most once every AUTH_TOKEN_TOUCH_INTERVAL.
+
+    def authenticate_credentials(self, key):
+        now = time.time()
+        entry = token_cache.get(key)
+        if entry is not None and _revocations().get(_revocation_key(entry.user.pk)) != entry.revoked:
+            token_cache.pop(key)
+            entry = None
+
+        if entry is None:
+            try:
+                token = Token.objects.select_related('user').get(key=key)
+            except Token.DoesNotExist:
+                raise AuthenticationFailed('Invalid token.')
+            if not token.user.is_active:
+                raise AuthenticationFailed('User inactive or deleted.')
+
+            # Preload so permission checks and request.shop are free
+            user_roles(token.user)
+            owned_shops(token.user)
+            entry = TokenCacheEntry(
+                token.user, token, token.created.timestamp(),
+                time.monotonic() + _setting('AUTH_TOKEN_CACHE_TTL', 60),
+                _revocations().get(_revocation_key(token.user.pk)),
+            )
+            token_cache.set(key, entry)
+
+        idle_timeout = _setting('AUTH_TOKEN_IDLE_TIMEOUT', None)
+        if idle_timeout and now - entry.last_used > idle_timeout.total_seconds():
+            token_cache.pop(key)
+            Token.objects.filter(key=key).delete()
+            raise AuthenticationFailed('Token has expired.')
+
+        entry.last_used = now
+        if now - entry.touched > _setting('AUTH_TOKEN_TOUCH_INTERVAL', timedelta(minutes=5)).total_seconds():
+            entry.touched = now
+            Token.objects.filter(key=key).update(created=timezone.now())
+
+        # Each request gets its own copy so per-request state never leaks
+        return copy.copy(entry.user), entry.token
+
+
+def touch_token(token):
+    # Restart the idle timer, e.g. when loginView hands out an existing token
+    Token.objects.filter(pk=token.pk).update(created=timezone.now())
+    token_cache.pop(token.key)
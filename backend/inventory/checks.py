@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.checks import Warning, register
+
+PER_PROCESS_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register()
+def shared_cache_check(app_configs, **kwargs):
+    # Roles and tokens are revoked by whichever process made the change; a
+    # per-process cache would keep serving revoked roles and tokens in every
+    # other worker until the entries expire
+    warnings = []
+    for setting in ('ROLE_CACHE_ALIAS', 'AUTH_TOKEN_REVOCATION_CACHE_ALIAS'):
+        alias = getattr(settings, setting, 'default')
+        backend = settings.CACHES.get(alias, {}).get('BACKEND')
+        if backend in PER_PROCESS_BACKENDS:
+            warnings.append(Warning(
+                f"{setting} points at a per-process cache ({backend}).",
+                hint="Invalidations from other workers and from import_products will not be seen; "
+                     "use a shared backend such as Redis or the file cache.",
+                id='inventory.W001',
+            ))
+    return warnings
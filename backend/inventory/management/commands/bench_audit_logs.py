@@ -0,0 +1,79 @@
+import random
+import time
+from datetime import timedelta
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from django.utils import timezone
+from rest_framework.request import Request
+from inventory.models import AuditLog, Shop
+from inventory.pagination import encode_cursor, keyset_page
+
+
+class Command(BaseCommand):
+    help = "Time audit log pages at increasing depth to check per-page latency stays flat"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seed", type=int, default=0, help="Insert this many synthetic audit rows first")
+        parser.add_argument("--page-size", type=int, default=50)
+        parser.add_argument("--repeat", type=int, default=5, help="Timed runs per page")
+
+    def handle(self, *args, **kwargs):
+        if kwargs["seed"]:
+            self.seed(kwargs["seed"])
+
+        total = AuditLog.objects.count()
+        if not total:
+            self.stderr.write(self.style.ERROR("No audit rows; run with --seed N"))
+            return
+
+        self.stdout.write(f"{total} audit rows, page size {kwargs['page_size']}")
+        shop_id = AuditLog.objects.exclude(shop=None).values_list("shop_id", flat=True).first()
+
+        scenarios = [("all", {})]
+        if shop_id:
+            scenarios.append(("shop", {"shop": str(shop_id)}))
+        scenarios.append(("action", {"action": "SALE"}))
+
+        for label, params in scenarios:
+            for depth in (0.0, 0.5, 0.99):
+                ms = self.time_page(params, depth, kwargs["page_size"], kwargs["repeat"])
+                self.stdout.write(f"{label:<8} depth {depth:>5.0%}  {ms:8.2f} ms/page")
+
+    def time_page(self, params, depth, page_size, repeat):
+        logs = AuditLog.objects.filter(**{("shop_id" if k == "shop" else k): v for k, v in params.items()})
+        query = dict(params)
+        offset = int(logs.count() * depth)
+        if offset:
+            row = logs.order_by("-timestamp", "-id").values("timestamp", "id")[offset]
+            query["cursor"] = encode_cursor(row["timestamp"], row["id"])
+
+        request = Request(RequestFactory(SERVER_NAME="localhost").get("/api/audit-logs/", query))
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            keyset_page(request, logs.select_related("user"), page_size=page_size)
+            timings.append(time.perf_counter() - start)
+        return min(timings) * 1000
+
+    def seed(self, count):
+        users = list(User.objects.all()[:10]) or [None]
+        shops = list(Shop.objects.all()[:10]) or [None]
+        actions = [choice for choice, _ in AuditLog.ACTION_CHOICES]
+        now = timezone.now()
+
+        batch = []
+        for i in range(count):
+            batch.append(AuditLog(
+                user=random.choice(users),
+                shop=random.choice(shops),
+                action=random.choice(actions),
+                model=random.choice(["Product", "Sale", None]),
+                details={"seeded": True},
+                timestamp=now - timedelta(seconds=random.randint(0, 365 * 24 * 3600)),
+            ))
+            if len(batch) == 5000:
+                AuditLog.objects.bulk_create(batch)
+                batch = []
+        AuditLog.objects.bulk_create(batch)
+        self.stdout.write(self.style.SUCCESS(f"Seeded {count} audit rows"))
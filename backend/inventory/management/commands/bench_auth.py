@@ -0,0 +1,51 @@
+import time
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+from inventory.authentication import CachedTokenAuthentication, token_cache
+from inventory.permissions import IsManager, IsSalesPerson, IsStockClerk
+
+
+class Command(BaseCommand):
+    help = "Compare per-request authentication + permission cost of DRF's TokenAuthentication and the cached one"
+
+    def add_arguments(self, parser):
+        parser.add_argument("username", help="User whose token is used (created if missing)")
+        parser.add_argument("--requests", type=int, default=1000)
+
+    def handle(self, *args, **kwargs):
+        try:
+            user = User.objects.get(username=kwargs["username"])
+        except User.DoesNotExist:
+            raise CommandError(f"No user named {kwargs['username']}")
+        token, _ = Token.objects.get_or_create(user=user)
+
+        token_cache.clear()
+        for label, authenticator in (("TokenAuthentication", TokenAuthentication),
+                                     ("CachedTokenAuthentication", CachedTokenAuthentication)):
+            queries, elapsed = self.run(authenticator, token.key, kwargs["requests"])
+            self.stdout.write(
+                f"{label:<26} {queries / kwargs['requests']:6.2f} queries/request  "
+                f"{elapsed / kwargs['requests'] * 1e6:8.1f} µs/request"
+            )
+
+    def run(self, authenticator, key, count):
+        factory = RequestFactory()
+        permission = (IsManager | IsStockClerk | IsSalesPerson)()
+
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            for _ in range(count):
+                request = Request(
+                    factory.get("/api/shop/info/", HTTP_AUTHORIZATION=f"Token {key}"),
+                    authenticators=[authenticator()],
+                )
+                request.user  # authenticate
+                permission.has_permission(request, None)
+            elapsed = time.perf_counter() - start
+        return len(queries), elapsed
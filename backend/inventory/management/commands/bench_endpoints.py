@@ -0,0 +1,118 @@
+import json
+import statistics
+import time
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from inventory.authentication import token_cache
+from inventory.models import Product
+from inventory.urls import urlpatterns
+
+# Read-only sample request per route; write routes are left to the
+# QueryBudgetTests since benchmarking them would change the data.
+SAMPLES = {
+    "products/": "/api/products/?page=1&page_size=50",
+    "products/changes/": "/api/products/changes/",
+    "products/<int:product_id>/": "/api/products/{product_id}/",
+    "sales/counts/": "/api/sales/counts/",
+    "sales/export/": "/api/sales/export/?output=csv",
+    "sales/series/": "/api/sales/series/?interval=month&group_by=category",
+    "categories/": "/api/categories/",
+    "stock/alerts/": "/api/stock/alerts/",
+    "stock/replenishment/": "/api/stock/replenishment/",
+    "shop/info/": "/api/shop/info/",
+    "audit-logs/": "/api/audit-logs/",
+    "audit-logs/export/": "/api/audit-logs/export/",
+}
+
+
+def full_scans(plan):
+    # Plan lines that read a whole table instead of an index
+    if connection.vendor == "postgresql":
+        return [line for line in plan if "Seq Scan" in line]
+    if connection.vendor == "sqlite":
+        return [line for line in plan if line.startswith("SCAN ") and " USING " not in line]
+    return []
+
+
+class Command(BaseCommand):
+    help = "Time every read endpoint against the current database and print the query plans it uses"
+
+    def add_arguments(self, parser):
+        parser.add_argument("username", help="User owning the shop to benchmark (see seed_data)")
+        parser.add_argument("--repeat", type=int, default=5, help="Timed runs per endpoint")
+        parser.add_argument("--warm", action="store_true", help="Keep caches between runs instead of starting cold")
+        parser.add_argument("--plans", action="store_true", help="Print the full plan of every query")
+        parser.add_argument("--save", help="Write the results as JSON, e.g. before adding indexes")
+        parser.add_argument("--compare", help="JSON saved by an earlier --save run to compare against")
+
+    def handle(self, *args, **kwargs):
+        try:
+            user = User.objects.get(username=kwargs["username"])
+        except User.DoesNotExist:
+            raise CommandError(f"No user named {kwargs['username']}")
+        token, _ = Token.objects.get_or_create(user=user)
+        client = Client(SERVER_NAME="localhost", HTTP_AUTHORIZATION=f"Token {token.key}")
+        product_id = Product.objects.filter(shop__owner=user).values_list("id", flat=True).first()
+
+        baseline = {}
+        if kwargs["compare"]:
+            with open(kwargs["compare"]) as f:
+                baseline = json.load(f)
+
+        skipped = sorted(str(p.pattern) for p in urlpatterns if str(p.pattern) not in SAMPLES)
+        self.stdout.write(f"{connection.vendor}, skipping write routes: {', '.join(skipped)}")
+
+        results = {}
+        for route, url in SAMPLES.items():
+            url = url.format(product_id=product_id)
+            timings = []
+            for _ in range(kwargs["repeat"]):
+                if not kwargs["warm"]:
+                    cache.clear()
+                    token_cache.clear()
+                with CaptureQueriesContext(connection) as queries:
+                    start = time.perf_counter()
+                    response = client.get(url)
+                    if response.streaming:
+                        b"".join(response.streaming_content)
+                    timings.append((time.perf_counter() - start) * 1000)
+
+            plans = [self.explain(q["sql"]) for q in queries if q["sql"].lstrip().upper().startswith("SELECT")]
+            scans = sorted({line for plan in plans for line in full_scans(plan)})
+            results[route] = {
+                "status": response.status_code,
+                "median_ms": round(statistics.median(timings), 2),
+                "queries": len(queries),
+                "full_scans": scans,
+            }
+            self.report(route, results[route], baseline.get(route))
+            if kwargs["plans"]:
+                for query, plan in zip((q for q in queries if q["sql"].lstrip().upper().startswith("SELECT")), plans):
+                    self.stdout.write(f"    {query['sql'][:160]}")
+                    for line in plan:
+                        self.stdout.write(f"      {line}")
+
+        if kwargs["save"]:
+            with open(kwargs["save"], "w") as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Saved results to {kwargs['save']}"))
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f"{connection.ops.explain_query_prefix()} {sql}")
+            rows = cursor.fetchall()
+        # SQLite returns (id, parent, notused, detail); Postgres one text column
+        return [str(row[-1]) for row in rows]
+
+    def report(self, route, result, before):
+        line = f"{route:<28} {result['status']}  {result['median_ms']:8.2f} ms  {result['queries']:2} queries"
+        if before:
+            line += f"  (was {before['median_ms']:.2f} ms, {result['median_ms'] / max(before['median_ms'], 0.01):.2f}x)"
+        self.stdout.write(line)
+        for scan in result["full_scans"]:
+            self.stdout.write(self.style.WARNING(f"    full scan: {scan}"))
@@ -0,0 +1,64 @@
+import gzip
+import time
+from datetime import timedelta
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from inventory import renderers
+from inventory.middleware import brotli
+from inventory.models import Category, Product, Shop
+from inventory.serializers import ProductViewSerializer
+
+
+class Command(BaseCommand):
+    help = "Compare JSON encoding CPU time and bytes on the wire for a product catalog"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=10_000)
+        parser.add_argument("--repeat", type=int, default=5, help="Runs per encoder; the fastest counts")
+
+    def handle(self, *args, **kwargs):
+        # Unsaved products, so no database is needed and only encoding is timed
+        shop = Shop(id=1, name="Bench Shop")
+        categories = [Category(id=i, name=f"Category {i}") for i in range(20)]
+        now = timezone.now()
+        products = [
+            Product(id=i, shop=shop, category=categories[i % 20], name=f"Product {i}", quantity=i % 500,
+                    price=Decimal(i % 10_000) / 100, created_at=now - timedelta(minutes=i), updated_at=now)
+            for i in range(kwargs["products"])
+        ]
+
+        start = time.process_time()
+        data = ProductViewSerializer(products, many=True).data
+        self.stdout.write(f"{kwargs['products']} products, serializer {(time.process_time() - start) * 1000:.1f} ms CPU")
+
+        encoders = [("DRF JSONRenderer", JSONRenderer().render)]
+        if renderers.orjson is not None:
+            encoders.append(("orjson", renderers.dumps))
+        else:
+            self.stdout.write("orjson is not installed; pip install orjson to compare")
+
+        for label, render in encoders:
+            timings = []
+            for _ in range(kwargs["repeat"]):
+                start = time.process_time()
+                content = render(data)
+                timings.append(time.process_time() - start)
+            self.stdout.write(f"{label:<18} {min(timings) * 1000:8.1f} ms CPU  {len(content):>10,} bytes")
+
+        for label, compress in self.compressors():
+            start = time.process_time()
+            compressed = compress(content)
+            elapsed = time.process_time() - start
+            self.stdout.write(
+                f"{label:<18} {elapsed * 1000:8.1f} ms CPU  {len(compressed):>10,} bytes "
+                f"({len(compressed) / len(content):.1%} of raw)"
+            )
+
+    def compressors(self):
+        yield "gzip (level 6)", lambda content: gzip.compress(content, compresslevel=6)
+        if brotli is not None:
+            yield "brotli (quality 5)", lambda content: brotli.compress(content, quality=5)
+        else:
+            self.stdout.write("brotli is not installed; pip install brotli to compare")
@@ -0,0 +1,37 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from inventory.models import AuditLog, Product
+from inventory.serializers import (
+    AuditLogSerializer, ProductViewSerializer, audit_log_dicts, audit_log_values, product_dicts, product_values,
+)
+
+
+class Command(BaseCommand):
+    help = "Rows/sec of the DRF serializers against the .values() fast path, on rows already in the database"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=10_000, help="Rows of each model to serialize")
+        parser.add_argument("--repeat", type=int, default=3, help="Runs per path; the fastest counts")
+
+    def handle(self, *args, **kwargs):
+        rows = kwargs["rows"]
+        products = Product.objects.order_by("id")[:rows]
+        logs = AuditLog.objects.order_by("-timestamp", "-id")[:rows]
+        if not products.exists():
+            raise CommandError("No products to serialize; run seed_data first")
+
+        cases = [
+            ("products", "ProductViewSerializer",
+             lambda: ProductViewSerializer(products.select_related("category", "shop"), many=True).data),
+            ("products", "product_dicts", lambda: product_dicts(product_values(products))),
+            ("audit logs", "AuditLogSerializer", lambda: AuditLogSerializer(logs.select_related("user"), many=True).data),
+            ("audit logs", "audit_log_dicts", lambda: audit_log_dicts(audit_log_values(logs))),
+        ]
+        for label, path, run in cases:
+            timings = []
+            for _ in range(kwargs["repeat"]):
+                start = time.perf_counter()
+                count = len(run())  # includes the query, as the endpoints do
+                timings.append(time.perf_counter() - start)
+            if count:
+                self.stdout.write(f"{label:<11} {path:<22} {count:>7} rows  {count / min(timings):>10,.0f} rows/s")
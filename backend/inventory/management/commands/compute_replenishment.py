@@ -0,0 +1,31 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from inventory.models import Shop
+from inventory.utils import replenishment
+
+
+class Command(BaseCommand):
+    help = "Recompute reorder suggestions from recent sales velocity"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--shop", type=int, help="Only compute this shop id")
+        parser.add_argument("--window", type=int, default=replenishment.WINDOW_DAYS, help="Days of sales to average")
+        parser.add_argument("--lead-time", type=int, default=replenishment.LEAD_TIME_DAYS,
+                            help="Days between ordering and receiving stock")
+        parser.add_argument("--cover", type=int, default=replenishment.COVER_DAYS,
+                            help="Days of stock to hold once an order arrives")
+
+    def handle(self, *args, **kwargs):
+        shops = Shop.objects.order_by("id")
+        if kwargs["shop"]:
+            shops = shops.filter(pk=kwargs["shop"])
+            if not shops:
+                raise CommandError(f"Shop {kwargs['shop']} does not exist")
+        if kwargs["window"] < 1:
+            raise CommandError("--window must be at least 1")
+
+        for shop in shops:
+            start = time.perf_counter()
+            count = replenishment.compute(shop, kwargs["window"], kwargs["lead_time"], kwargs["cover"])
+            self.stdout.write(f"{shop}: {count} products in {time.perf_counter() - start:.1f}s")
+        self.stdout.write(self.style.SUCCESS("Replenishment suggestions updated"))
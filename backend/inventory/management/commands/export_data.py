@@ -0,0 +1,54 @@
+import sys
+import time
+from django.core.management.base import BaseCommand, CommandError
+from inventory.models import AuditLog, Sale
+from inventory.utils.export import AUDIT_LOG_FIELDS, SALE_FIELDS, FORMATS, export_chunks
+
+DATASETS = {
+    "audit-logs": (AuditLog, AUDIT_LOG_FIELDS),
+    "sales": (Sale, SALE_FIELDS),
+}
+
+
+class Command(BaseCommand):
+    help = "Stream audit logs or sales to a file as NDJSON or CSV, optionally gzipped"
+
+    def add_arguments(self, parser):
+        parser.add_argument("dataset", choices=DATASETS)
+        parser.add_argument("--format", choices=FORMATS, default="ndjson")
+        parser.add_argument("--gzip", action="store_true")
+        parser.add_argument("--shop", type=int, help="Only export rows for this shop id")
+        parser.add_argument("--output", "-o", help="File to write (default: stdout)")
+        parser.add_argument("--chunk-size", type=int, default=2000)
+
+    def handle(self, *args, **kwargs):
+        model, fields = DATASETS[kwargs["dataset"]]
+        queryset = model.objects.all()
+        if kwargs["shop"]:
+            queryset = queryset.filter(shop_id=kwargs["shop"])
+
+        if kwargs["output"]:
+            try:
+                out = open(kwargs["output"], "wb")
+            except OSError as e:
+                raise CommandError(str(e))
+        elif kwargs["gzip"] and sys.stdout.isatty():
+            raise CommandError("Refusing to write gzip data to a terminal; use --output")
+        else:
+            out = sys.stdout.buffer
+
+        start = time.perf_counter()
+        written = 0
+        try:
+            for chunk in export_chunks(queryset, fields, kwargs["format"], kwargs["gzip"], kwargs["chunk_size"]):
+                out.write(chunk)
+                written += len(chunk)
+        finally:
+            if kwargs["output"]:
+                out.close()
+
+        if kwargs["output"]:
+            elapsed = time.perf_counter() - start
+            self.stdout.write(self.style.SUCCESS(
+                f"Wrote {written} bytes to {kwargs['output']} in {elapsed:.1f}s"
+            ))
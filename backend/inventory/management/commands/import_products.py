@@ -1,47 +1,108 @@
+import multiprocessing
 import os
-import openpyxl
-from django.core.management.base import BaseCommand
-from inventory.models import Product  
+import time
+from concurrent.futures import ProcessPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
+from inventory.models import Category, Shop
+from inventory.utils import catalog_cache, importer
+
 
 class Command(BaseCommand):
-    help = "Import products from an Excel file"
+    help = "Import products from CSV or Excel files, creating or updating them by (shop, name)"
 
     def add_arguments(self, parser):
-        parser.add_argument("file_path", type=str, help="Path to the Excel file")
+        parser.add_argument("paths", nargs="+", help=".csv/.xlsx files, directories or glob patterns")
+        parser.add_argument("--shop", type=int, required=True, help="Shop id to import into")
+        parser.add_argument("--category", type=int, help="Category id for newly created products")
+        parser.add_argument(
+            "--columns",
+            help="Header names to read, e.g. 'name=Product,quantity=Qty,price=Unit Price'. "
+                 "Defaults to headers named name/quantity/price, else the columns quantity, name, price.",
+        )
+        parser.add_argument("--chunk-size", type=int, default=5000)
+        parser.add_argument(
+            "--workers", type=int, default=os.cpu_count() or 1,
+            help="Processes parsing files in parallel; 1 parses in this process",
+        )
 
     def handle(self, *args, **kwargs):
-        file_path = kwargs["file_path"]
+        paths = importer.expand_paths(kwargs["paths"])
+        missing = [path for path in paths if not os.path.isfile(path)]
+        if missing:
+            raise CommandError(f"File not found: {', '.join(missing)}")
+        if not paths:
+            raise CommandError("No .csv or .xlsx files matched")
+
+        try:
+            shop = Shop.objects.get(pk=kwargs["shop"])
+        except Shop.DoesNotExist:
+            raise CommandError(f"Shop {kwargs['shop']} does not exist")
 
-        if not os.path.exists(file_path):
-            self.stderr.write(self.style.ERROR("File not found!"))
-            return
+        category = None
+        if kwargs["category"]:
+            try:
+                category = Category.objects.get(pk=kwargs["category"])
+            except Category.DoesNotExist:
+                raise CommandError(f"Category {kwargs['category']} does not exist")
 
         try:
-            wb = openpyxl.load_workbook(file_path)
-            sheet = wb.active  # Get the first sheet
-
-            products_created = 0
-            for row in sheet.iter_rows(min_row=2, values_only=True):  # Start from row 2
-                quantity, name, price = row
-
-                # Skip empty rows
-                if not name:
-                    continue
-
-                product, created = Product.objects.get_or_create(
-                    name=name.strip(),
-                    defaults={
-                        "category_id": 1,  # Assign category ID 1
-                        "quantity": int(quantity),
-                        "price": float(price),
-                        "shop_id": 2
-                    }
-                )
-
-                if created:
-                    products_created += 1
-
-            self.stdout.write(self.style.SUCCESS(f"Successfully imported {products_created} products with category ID 7."))
-
-        except Exception as e:
-            self.stderr.write(self.style.ERROR(f"Error: {str(e)}"))
+            columns = importer.parse_columns(kwargs["columns"])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        # Workers only parse and validate; this process is the single writer,
+        # so chunks never contend for the same rows. Files are written in
+        # argument order, so a product in several files ends with the last
+        # one. Each file streams through its own small queue, so at most a
+        # few chunks per worker are ever held in memory.
+        size = kwargs["chunk_size"]
+        workers = min(kwargs["workers"], len(paths))
+        created = updated = rejected = processed = 0
+        start = time.perf_counter()
+        executor = manager = None
+        if workers > 1:
+            executor = ProcessPoolExecutor(max_workers=workers)
+            manager = multiprocessing.Manager()
+            files = self.pooled(executor, manager, paths, columns, size)
+        else:
+            files = ((path, importer.read_chunks(path, columns, size)) for path in paths)
+
+        try:
+            for path, chunks in files:
+                file_rows = file_errors = 0
+                for rows, errors in chunks:
+                    for line, message in errors:
+                        self.stderr.write(f"{path}:{line}: {message}" if line else f"{path}: {message}")
+                    file_errors += len(errors)
+
+                    if rows:
+                        c, u, _ = importer.upsert_chunk(shop, rows, category)
+                        created, updated = created + c, updated + u
+                        file_rows, processed = file_rows + len(rows), processed + len(rows)
+                        elapsed = time.perf_counter() - start
+                        self.stdout.write(f"{processed} rows  {processed / elapsed:,.0f} rows/s")
+                rejected += file_errors
+                self.stdout.write(f"{path}: {file_rows} rows, {file_errors} rejected")
+        finally:
+            if manager:
+                # Unblocks workers still waiting to hand over chunks
+                manager.shutdown()
+            if executor:
+                executor.shutdown(cancel_futures=True)
+            catalog_cache.invalidate(shop.id)
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {processed} rows from {len(paths)} files in {elapsed:.1f}s: "
+            f"{created} created, {updated} updated, {rejected} rejected"
+        ))
+
+    def pooled(self, executor, manager, paths, columns, size):
+        # Yields (path, chunks) in argument order while workers parse ahead;
+        # queues of two chunks keep a fast parser from running far ahead
+        queues = [manager.Queue(maxsize=2) for _ in paths]
+        futures = [executor.submit(importer.load_file, path, queue, columns, size)
+                   for path, queue in zip(paths, queues)]
+        for path, queue, future in zip(paths, queues, futures):
+            yield path, iter(queue.get, None)
+            future.result()  # re-raises anything unexpected from the worker
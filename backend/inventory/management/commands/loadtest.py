@@ -0,0 +1,181 @@
+import http.client
+import json
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from inventory.models import Product
+
+# Scenario name -> (method, path, body builder). Body builders get the
+# product ids of the shop the simulated user works in.
+SCENARIOS = {
+    "list_products": ("GET", "/api/products/?page=1&page_size=50", None),
+    "sales_count": ("GET", "/api/sales/counts/", None),
+    "audit_logs": ("GET", "/api/audit-logs/", None),
+    "record_sale": ("POST", "/api/sales/record/",
+                    lambda rng, ids: {"sales": [{"product_id": pid, "quantity": 1} for pid in rng.sample(ids, min(3, len(ids)))]}),
+}
+
+
+def percentile(sorted_values, p):
+    # Nearest-rank percentile of an already sorted list
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, round(p / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive API scenarios against a running server with concurrent clients and report latency "
+        "percentiles, throughput and queries per request, optionally against a saved baseline"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", default="http://127.0.0.1:8000", help="Base URL of the server under test")
+        parser.add_argument("--owners", default="bench",
+                            help="Username prefix of the shop owners to act as (see seed_data)")
+        parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS),
+                            help="Scenario to run; repeat for several (default: all)")
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument("--requests", type=int, default=500, help="Requests per scenario")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--save", help="Write the results to this JSON file, e.g. as the new baseline")
+        parser.add_argument("--baseline", help="Fail if results regress against this JSON file")
+        parser.add_argument("--tolerance", type=float, default=0.2,
+                            help="Allowed relative regression in p95 latency and throughput")
+
+    def handle(self, *args, **kwargs):
+        users = list(User.objects.filter(username__startswith=kwargs["owners"], shop__isnull=False).distinct())
+        if not users:
+            raise CommandError(f"No shop owners named {kwargs['owners']}*; run seed_data first")
+
+        # One (token, product ids) identity per owner; worker threads take turns
+        identities = []
+        for user in users:
+            token, _ = Token.objects.get_or_create(user=user)
+            ids = list(Product.objects.filter(shop__owner=user, quantity__gt=100).values_list("id", flat=True)[:1000])
+            identities.append((token.key, ids))
+
+        results = {}
+        for name in kwargs["scenario"] or list(SCENARIOS):
+            result = self.run_scenario(name, identities, **kwargs)
+            result["queries_per_request"] = self.count_queries(name, identities[0], kwargs["seed"])
+            results[name] = result
+            self.stdout.write(
+                f"{name:<14} {result['requests']:6} req  {result['errors']:4} err  "
+                f"{result['throughput']:8.1f} req/s  p50 {result['p50_ms']:7.1f}  "
+                f"p95 {result['p95_ms']:7.1f}  p99 {result['p99_ms']:7.1f} ms  "
+                f"{result['queries_per_request']:5.1f} queries/req"
+            )
+
+        if kwargs["save"]:
+            with open(kwargs["save"], "w") as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(f"Saved results to {kwargs['save']}")
+
+        if kwargs["baseline"]:
+            with open(kwargs["baseline"]) as f:
+                baseline = json.load(f)
+            regressions = self.compare(results, baseline, kwargs["tolerance"])
+            for message in regressions:
+                self.stderr.write(self.style.ERROR(message))
+            if regressions:
+                raise CommandError(f"{len(regressions)} regressions against {kwargs['baseline']}")
+            self.stdout.write(self.style.SUCCESS("No regressions against the baseline"))
+
+    def run_scenario(self, name, identities, **kwargs):
+        method, path, build_body = SCENARIOS[name]
+        target = urlsplit(kwargs["url"])
+        connection_class = http.client.HTTPSConnection if target.scheme == "https" else http.client.HTTPConnection
+        remaining = iter(range(kwargs["requests"]))
+        lock = threading.Lock()
+        latencies, errors = [], [0]
+
+        def worker(index):
+            rng = random.Random(kwargs["seed"] + index)
+            token, product_ids = identities[index % len(identities)]
+            conn = connection_class(target.netloc, timeout=30)  # keep-alive per client
+            headers = {"Authorization": f"Token {token}", "Content-Type": "application/json"}
+            while True:
+                with lock:
+                    if next(remaining, None) is None:
+                        break
+                body = json.dumps(build_body(rng, product_ids)) if build_body else None
+                start = time.perf_counter()
+                try:
+                    conn.request(method, target.path.rstrip("/") + path, body=body, headers=headers)
+                    response = conn.getresponse()
+                    response.read()
+                    ok = response.status < 400
+                except (OSError, http.client.HTTPException):
+                    conn.close()
+                    conn = connection_class(target.netloc, timeout=30)
+                    ok = False
+                elapsed = (time.perf_counter() - start) * 1000
+                with lock:
+                    latencies.append(elapsed)
+                    errors[0] += not ok
+            conn.close()
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(kwargs["concurrency"])]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall = time.perf_counter() - start
+
+        latencies.sort()
+        return {
+            "requests": len(latencies),
+            "errors": errors[0],
+            "throughput": round(len(latencies) / wall, 1) if wall else 0.0,
+            "p50_ms": round(percentile(latencies, 50), 2),
+            "p95_ms": round(percentile(latencies, 95), 2),
+            "p99_ms": round(percentile(latencies, 99), 2),
+        }
+
+    def count_queries(self, name, identity, seed, samples=5):
+        # The server process is out of reach, so count queries by replaying the
+        # scenario in-process against the same database, caches cold
+        method, path, build_body = SCENARIOS[name]
+        token, product_ids = identity
+        client = Client(SERVER_NAME="localhost", HTTP_AUTHORIZATION=f"Token {token}")
+        rng = random.Random(seed)
+        total = 0
+        for _ in range(samples):
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                if method == "GET":
+                    client.get(path)
+                else:
+                    client.post(path, json.dumps(build_body(rng, product_ids)), content_type="application/json")
+            total += len(queries)
+        return total / samples
+
+    def compare(self, results, baseline, tolerance):
+        regressions = []
+        for name, result in results.items():
+            before = baseline.get(name)
+            if not before:
+                continue
+            if result["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+                regressions.append(f"{name}: p95 {result['p95_ms']:.1f} ms, baseline {before['p95_ms']:.1f} ms")
+            if result["throughput"] < before["throughput"] * (1 - tolerance):
+                regressions.append(f"{name}: {result['throughput']:.1f} req/s, baseline {before['throughput']:.1f} req/s")
+            if result["queries_per_request"] > before["queries_per_request"]:
+                regressions.append(
+                    f"{name}: {result['queries_per_request']:.1f} queries/request, "
+                    f"baseline {before['queries_per_request']:.1f}"
+                )
+            if result["errors"] > before["errors"]:
+                regressions.append(f"{name}: {result['errors']} errors, baseline {before['errors']}")
+        return regressions
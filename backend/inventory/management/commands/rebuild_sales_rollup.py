@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+from inventory.models import Shop
+from inventory.utils import rollups
+
+
+class Command(BaseCommand):
+    help = "Rebuild the daily sales rollup table from the Sale history"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--shop", type=int, help="Only rebuild this shop id")
+
+    def handle(self, *args, **kwargs):
+        shop = None
+        if kwargs["shop"]:
+            try:
+                shop = Shop.objects.get(pk=kwargs["shop"])
+            except Shop.DoesNotExist:
+                raise CommandError(f"Shop {kwargs['shop']} does not exist")
+
+        count = rollups.rebuild(shop)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} daily rollup rows"))
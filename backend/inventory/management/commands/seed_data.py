@@ -0,0 +1,105 @@
+import random
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+from django.contrib.auth.models import Group, User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from inventory.models import AuditLog, Category, Product, Sale, Shop, StockAlert
+from inventory.utils import catalog_cache, replenishment, rollups
+
+BATCH = 5000
+
+
+@contextmanager
+def backdated(model, field):
+    # Let bulk_create keep the timestamps we generate instead of "now"
+    field = model._meta.get_field(field)
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+class Command(BaseCommand):
+    help = "Seed shops with realistic volumes of products, sales and audit logs for benchmarking"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--shops", type=int, default=1)
+        parser.add_argument("--shop-name", default="Bench Shop", help="Numbered when seeding several shops")
+        parser.add_argument("--owner", default="bench",
+                            help="Manager user owning the shop, numbered like the shops (password: bench)")
+        parser.add_argument("--products", type=int, default=10_000, help="Per shop, like the other counts")
+        parser.add_argument("--sales", type=int, default=200_000)
+        parser.add_argument("--audit-logs", type=int, default=200_000)
+        parser.add_argument("--days", type=int, default=730, help="Spread sales and logs over this many days")
+        parser.add_argument("--seed", type=int, default=0, help="Random seed, for repeatable data")
+
+    def handle(self, *args, **kwargs):
+        rng = random.Random(kwargs["seed"])
+        categories = [Category.objects.get_or_create(name=f"Bench {i}")[0] for i in range(20)]
+        shop_name, owner = kwargs.pop("shop_name"), kwargs.pop("owner")
+        for i in range(kwargs["shops"]):
+            suffix = f" {i + 1}" if kwargs["shops"] > 1 else ""
+            self.seed_shop(rng, categories, shop_name + suffix, owner + suffix.strip(), **kwargs)
+
+    def seed_shop(self, rng, categories, shop_name, owner, **kwargs):
+        start = time.perf_counter()
+        user, created = User.objects.get_or_create(username=owner)
+        if created:
+            user.set_password("bench")
+            user.save()
+        user.groups.add(Group.objects.get_or_create(name="Manager")[0])
+        shop, _ = Shop.objects.get_or_create(name=shop_name)
+        shop.owner.add(user)
+
+        with transaction.atomic():
+            offset = Product.objects.filter(shop=shop).count()
+            products = Product.objects.bulk_create(
+                (Product(shop=shop, category=rng.choice(categories), name=f"Product {offset + i}",
+                         quantity=rng.randint(0, 500), price=Decimal(rng.randint(50, 50_000)) / 100)
+                 for i in range(kwargs["products"])),
+                batch_size=BATCH,
+            )
+            alerts = []
+            for p in rng.sample(products, len(products) // 10):
+                # Flagged the way stock_alerts.evaluate would
+                threshold = rng.randint(1, 20)
+                alerts.append(StockAlert(product=p, shop=shop, threshold=threshold, is_alerted=p.quantity <= threshold))
+            StockAlert.objects.bulk_create(alerts, batch_size=BATCH)
+        self.stdout.write(f"{len(products)} products")
+
+        products = list(Product.objects.filter(shop=shop).values_list("id", "price"))
+        now = timezone.now()
+        seconds = kwargs["days"] * 24 * 3600
+        if products:
+            with backdated(Sale, "created_at"), transaction.atomic():
+                def sales():
+                    for _ in range(kwargs["sales"]):
+                        product_id, price = rng.choice(products)
+                        quantity = rng.randint(1, 5)
+                        yield Sale(shop=shop, product_id=product_id, quantity_sold=quantity,
+                                   total_price=price * quantity,
+                                   created_at=now - timedelta(seconds=rng.randint(0, seconds)))
+                Sale.objects.bulk_create(sales(), batch_size=BATCH)
+            self.stdout.write(f"{kwargs['sales']} sales")
+
+        actions = [choice for choice, _ in AuditLog.ACTION_CHOICES]
+        with transaction.atomic():
+            AuditLog.objects.bulk_create(
+                (AuditLog(user=user, shop=shop, action=rng.choice(actions), model=rng.choice(["Product", "Sale", None]),
+                          details={"seeded": True}, timestamp=now - timedelta(seconds=rng.randint(0, seconds)))
+                 for _ in range(kwargs["audit_logs"])),
+                batch_size=BATCH,
+            )
+        self.stdout.write(f"{kwargs['audit_logs']} audit logs")
+
+        rollups.rebuild(shop)
+        replenishment.compute(shop)
+        catalog_cache.invalidate(shop.id)
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded shop {shop.id} ({shop.name}) owned by {user.username} in {time.perf_counter() - start:.1f}s"
+        ))
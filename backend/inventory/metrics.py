@@ -0,0 +1,77 @@
+import bisect
+import threading
+
+# In-process Prometheus-style histograms. Each worker process keeps its own
+# numbers; Prometheus sums them when every worker is scraped (or use one
+# worker per scrape target).
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}  # name -> (help, buckets, {labels: Histogram})
+        self.lock = threading.Lock()
+
+    def histogram(self, name, help, buckets):
+        self.metrics.setdefault(name, (help, buckets, {}))
+
+    def observe(self, name, labels, value):
+        help, buckets, series = self.metrics[name]
+        with self.lock:
+            histogram = series.get(labels)
+            if histogram is None:
+                histogram = series[labels] = Histogram(buckets)
+            histogram.observe(value)
+
+    def clear(self):
+        with self.lock:
+            for _, _, series in self.metrics.values():
+                series.clear()
+
+    def render(self):
+        # Prometheus text exposition format 0.0.4
+        lines = []
+        with self.lock:
+            for name, (help, buckets, series) in sorted(self.metrics.items()):
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} histogram")
+                for labels, histogram in sorted(series.items()):
+                    label_text = ",".join(f'{key}="{escape(value)}"' for key, value in labels)
+                    prefix = label_text + "," if label_text else ""
+                    cumulative = 0
+                    for bound, count in zip(buckets + ("+Inf",), histogram.counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+                    lines.append(f"{name}_sum{{{label_text}}} {histogram.sum}")
+                    lines.append(f"{name}_count{{{label_text}}} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+registry = Registry()
+registry.histogram("inventory_request_duration_seconds", "Wall time per request", DURATION_BUCKETS)
+registry.histogram("inventory_db_queries", "Database queries per request", QUERY_BUCKETS)
+registry.histogram("inventory_db_duration_seconds", "Time spent in database queries per request", DURATION_BUCKETS)
+registry.histogram("inventory_render_duration_seconds", "Time spent rendering (serializing) the response", DURATION_BUCKETS)
+registry.histogram("inventory_response_bytes", "Response body size", SIZE_BUCKETS)
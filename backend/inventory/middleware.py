@@ -1,5 +1,28 @@
+import abc
+import logging
+import random
+import time
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_string
 from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
+from .metrics import registry
 from .utils.audit_logger import log_action
+from .utils.shops import resolve_shop
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+try:
+    import brotli
+except ImportError:  # optional; responses fall back to gzip
+    brotli = None
+
+slow_log = logging.getLogger("inventory.performance")
 
 class AuditLogMiddleware:
     def __init__(self, get_response):
@@ -15,4 +38,237 @@ class AuditLogMiddleware:
                 details={'method': request.method, 'path': request.path}
             )
 
-        return response
\ No newline at end of file
+        return response
+
+
+class HybridMiddleware(abc.ABC):
+    # Base for middleware that runs natively in both sync and async handler
+    # chains. A sync-only middleware in front of an async view would make
+    # Django hold a thread for the whole request under ASGI. Subclasses
+    # implement both handle() (sync) and __acall__() (async).
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.handle(request)
+
+    @abc.abstractmethod
+    def handle(self, request):
+        pass
+
+    @abc.abstractmethod
+    async def __acall__(self, request):
+        pass
+
+
+class ShopMiddleware(HybridMiddleware):
+    # Attaches request.shop, resolved lazily on first use so it sees the user
+    # DRF authenticates inside the view (token auth happens after middleware)
+    def handle(self, request):
+        request.shop = SimpleLazyObject(lambda: resolve_shop(request))
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        request.shop = SimpleLazyObject(lambda: resolve_shop(request))
+        return await self.get_response(request)
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    # WhiteNoise, usable from async handler chains too: static files are
+    # served from a worker thread, everything else goes straight through
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
+
+
+class QueryTimer:
+    # Execute wrapper (see time_query): counts queries and their time, and
+    # keeps the SQL only for requests sampled for the slow-request log
+    def __init__(self, keep_sql):
+        self.count = 0
+        self.duration = 0.0
+        self.sql = [] if keep_sql else None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.count += 1
+            self.duration += elapsed
+            if self.sql is not None:
+                self.sql.append((elapsed, sql))
+
+
+# The active request's QueryTimer. Async views run their queries in worker
+# threads with their own connections; a context variable follows the request
+# there, where a per-connection execute_wrapper would not.
+current_timer = ContextVar("inventory_query_timer", default=None)
+
+
+def time_query(execute, sql, params, many, context):
+    timer = current_timer.get()
+    if timer is None:
+        return execute(sql, params, many, context)
+    return timer(execute, sql, params, many, context)
+
+
+def install_query_timer(connection):
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_query)
+
+
+@receiver(connection_created)
+def connection_opened(sender, connection, **kwargs):
+    install_query_timer(connection)
+
+
+class PerformanceMiddleware(HybridMiddleware):
+    # Per-request wall time, DB queries and DB time, render time and response
+    # size, kept in the in-process histograms served at /metrics. A sample of
+    # requests slower than PERF_SLOW_REQUEST_THRESHOLD is logged with its SQL.
+    def handle(self, request):
+        # Connections opened before this module was imported
+        install_query_timer(connection)
+        timer, token, start = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_timer.reset(token)
+        return self.finish(request, response, timer, start)
+
+    async def __acall__(self, request):
+        timer, token, start = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_timer.reset(token)
+        return self.finish(request, response, timer, start)
+
+    def start(self, request):
+        sampled = random.random() < getattr(settings, 'PERF_SLOW_REQUEST_SAMPLE_RATE', 0.1)
+        timer = QueryTimer(keep_sql=sampled)
+        request._perf_render = 0.0
+        return timer, current_timer.set(timer), time.perf_counter()
+
+    def finish(self, request, response, timer, start):
+        elapsed = time.perf_counter() - start
+
+        match = request.resolver_match
+        view = match.route if match else "unmatched"
+        labels = (("view", view),)
+        registry.observe("inventory_request_duration_seconds",
+                         (("method", request.method), ("status", f"{response.status_code // 100}xx"), ("view", view)),
+                         elapsed)
+        registry.observe("inventory_db_queries", labels, timer.count)
+        registry.observe("inventory_db_duration_seconds", labels, timer.duration)
+        if request._perf_render:
+            registry.observe("inventory_render_duration_seconds", labels, request._perf_render)
+        if not response.streaming:
+            registry.observe("inventory_response_bytes", labels, len(response.content))
+
+        if timer.sql is not None and elapsed > getattr(settings, 'PERF_SLOW_REQUEST_THRESHOLD', 1.0):
+            slow_log.warning(
+                "Slow request %s %s: %.3fs, %d queries in %.3fs\n%s",
+                request.method, request.get_full_path(), elapsed, timer.count, timer.duration,
+                "\n".join(f"  {t * 1000:8.2f} ms  {sql}" for t, sql in timer.sql),
+            )
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered (serialized to JSON) after this hook
+        started = time.perf_counter()
+
+        def rendered(response):
+            request._perf_render = time.perf_counter() - started
+        response.add_post_render_callback(rendered)
+        return response
+
+
+def accepted_encodings(header):
+    # "gzip;q=0.8, br" -> {"gzip": 0.8, "br": 1.0}
+    encodings = {}
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        if coding:
+            encodings[coding.strip().lower()] = q
+    return encodings
+
+
+class CompressionMiddleware(HybridMiddleware):
+    # Brotli (when the brotli package is installed) or gzip for responses of
+    # at least COMPRESSION_MIN_SIZE bytes, whichever the client prefers in
+    # Accept-Encoding. Streaming exports are left alone; they offer ?gzip=1.
+    def handle(self, request):
+        return self.compress(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.compress(request, await self.get_response(request))
+
+    def compress(self, request, response):
+        if response.streaming or response.has_header("Content-Encoding"):
+            return response
+        if len(response.content) < getattr(settings, 'COMPRESSION_MIN_SIZE', 1024):
+            return response
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        encoding = self.choose(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        if encoding == "br":
+            content = brotli.compress(response.content, quality=getattr(settings, 'COMPRESSION_BROTLI_QUALITY', 5))
+        elif encoding == "gzip":
+            content = compress_string(response.content, max_random_bytes=100)
+        else:
+            return response
+        if len(content) >= len(response.content):
+            return response
+
+        response.content = content
+        response.headers["Content-Length"] = str(len(content))
+        response.headers["Content-Encoding"] = encoding
+        # The compressed body is a different representation: ETags become weak
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response.headers["ETag"] = "W/" + etag
+        return response
+
+    def choose(self, header):
+        accepted = accepted_encodings(header)
+        wildcard = accepted.get("*", 0.0)
+        options = [("gzip", accepted.get("gzip", wildcard))]
+        if brotli is not None:
+            # Preferred on a tie: smaller at a similar CPU cost
+            options.insert(0, ("br", accepted.get("br", wildcard)))
+        encoding, q = max(options, key=lambda option: option[1])
+        return encoding if q > 0 else None
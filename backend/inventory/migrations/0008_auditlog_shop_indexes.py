@@ -0,0 +1,45 @@
+# Generated by Django 5.1.5 on 2026-10-18 16:41
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from inventory.operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+
+    # Indexes on existing, possibly large tables are built concurrently
+    atomic = False
+
+    dependencies = [
+        ('inventory', '0007_alter_sale_product'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='auditlog',
+            name='shop',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='audit_logs', to='inventory.shop'),
+        ),
+        AddIndexConcurrently(
+            model_name='auditlog',
+            index=models.Index(fields=['timestamp', 'id'], name='auditlog_ts_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='auditlog',
+            index=models.Index(fields=['shop', 'timestamp', 'id'], name='auditlog_shop_ts_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='auditlog',
+            index=models.Index(fields=['user', 'timestamp', 'id'], name='auditlog_user_ts_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='auditlog',
+            index=models.Index(fields=['action', 'timestamp', 'id'], name='auditlog_action_ts_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='auditlog',
+            index=models.Index(fields=['model', 'timestamp', 'id'], name='auditlog_model_ts_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.1.5 on 2026-10-18 16:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+
+
+def backfill_rollup(apps, schema_editor):
+    Sale = apps.get_model('inventory', 'Sale')
+    DailySalesRollup = apps.get_model('inventory', 'DailySalesRollup')
+    rows = (
+        Sale.objects.annotate(date=TruncDate('created_at'))
+        .values('shop_id', 'date', 'product_id')
+        .annotate(quantity=Sum('quantity_sold'), revenue=Sum('total_price'))
+        .order_by()
+    )
+    DailySalesRollup.objects.bulk_create((DailySalesRollup(**row) for row in rows), batch_size=5000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0008_auditlog_shop_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('quantity', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('product', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='inventory.product')),
+                ('shop', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='inventory.shop')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('shop', 'date', 'product'), name='daily_sales_rollup_unique')],
+            },
+        ),
+        migrations.RunPython(backfill_rollup, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.1.5 on 2026-10-18 16:44
+
+from django.db import migrations, models
+from inventory.operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+
+    # Indexes on existing, possibly large tables are built concurrently
+    atomic = False
+
+    dependencies = [
+        ('inventory', '0009_dailysalesrollup'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='sale',
+            index=models.Index(fields=['shop', 'created_at'], name='sale_shop_created_idx'),
+        ),
+    ]
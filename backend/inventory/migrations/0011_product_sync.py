@@ -0,0 +1,40 @@
+# Generated by Django 5.1.5 on 2026-10-18 16:46
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from inventory.operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+
+    # Indexes on existing, possibly large tables are built concurrently
+    atomic = False
+
+    dependencies = [
+        ('inventory', '0010_sale_shop_created_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product_id', models.BigIntegerField()),
+                ('deleted_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        AddIndexConcurrently(
+            model_name='product',
+            index=models.Index(fields=['shop', 'updated_at'], name='product_shop_updated_idx'),
+        ),
+        migrations.AddField(
+            model_name='producttombstone',
+            name='shop',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='product_tombstones', to='inventory.shop'),
+        ),
+        migrations.AddIndex(
+            model_name='producttombstone',
+            index=models.Index(fields=['shop', 'deleted_at'], name='tombstone_shop_deleted_idx'),
+        ),
+    ]
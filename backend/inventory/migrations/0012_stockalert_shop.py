@@ -0,0 +1,39 @@
+# Generated by Django 5.1.5 on 2026-10-18 17:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery
+
+
+def fill_shop_and_alerts(apps, schema_editor):
+    StockAlert = apps.get_model('inventory', 'StockAlert')
+    Product = apps.get_model('inventory', 'Product')
+    product = Product.objects.filter(pk=OuterRef('product_id'))
+    StockAlert.objects.update(shop_id=Subquery(product.values('shop_id')[:1]))
+    StockAlert.objects.filter(product__quantity__lte=F('threshold')).update(is_alerted=True)
+    StockAlert.objects.filter(product__quantity__gt=F('threshold')).update(is_alerted=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0011_product_sync'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stockalert',
+            name='shop',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='stock_alerts', to='inventory.shop'),
+        ),
+        migrations.RunPython(fill_shop_and_alerts, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='stockalert',
+            name='shop',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='stock_alerts', to='inventory.shop'),
+        ),
+        migrations.AddIndex(
+            model_name='stockalert',
+            index=models.Index(condition=models.Q(('is_alerted', True)), fields=['shop'], name='stockalert_shop_alerted_idx'),
+        ),
+    ]
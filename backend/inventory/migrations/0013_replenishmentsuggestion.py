@@ -0,0 +1,29 @@
+# Generated by Django 5.1.5 on 2026-10-18 16:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0012_stockalert_shop'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReplenishmentSuggestion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('avg_daily_units', models.FloatField()),
+                ('days_of_cover', models.FloatField(blank=True, null=True)),
+                ('reorder_quantity', models.PositiveIntegerField()),
+                ('computed_at', models.DateTimeField()),
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='replenishment', to='inventory.product')),
+                ('shop', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='replenishment_suggestions', to='inventory.shop')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['shop', 'days_of_cover'], name='replenish_shop_cover_idx')],
+            },
+        ),
+    ]
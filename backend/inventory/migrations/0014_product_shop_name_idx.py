@@ -0,0 +1,20 @@
+# Generated by Django 5.1.5 on 2026-10-18 16:58
+
+from django.db import migrations, models
+from inventory.operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('inventory', '0013_replenishmentsuggestion'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='product',
+            index=models.Index(fields=['shop', 'name'], name='product_shop_name_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.1.5 on 2026-10-18 17:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0014_product_shop_name_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogVersion',
+            fields=[
+                ('shop', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='catalog_version', serialize=False, to='inventory.shop')),
+                ('version', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.utils import timezone
 # Create your models here
@@ -27,10 +27,43 @@ class Product(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["shop", "updated_at"], name="product_shop_updated_idx"),
+            models.Index(fields=["shop", "name"], name="product_shop_name_idx"),
+        ]
+
     def __str__(self):
         return f"{self.name} - {self.quantity} in stock"
 
 
+class CatalogVersion(models.Model):
+    # Bumped on every change to a shop's catalog (utils/catalog_cache.py).
+    # Kept in the database so the increment is atomic and every worker and
+    # host reads the same number.
+    shop = models.OneToOneField(Shop, on_delete=models.CASCADE, primary_key=True, related_name="catalog_version")
+    version = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.shop} catalog v{self.version}"
+
+
+class ProductTombstone(models.Model):
+    # Left behind when a product is deleted so /api/products/changes/ can tell
+    # syncing clients to drop it
+    shop = models.ForeignKey(Shop, on_delete=models.CASCADE, related_name="product_tombstones")
+    product_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["shop", "deleted_at"], name="tombstone_shop_deleted_idx"),
+        ]
+
+    def __str__(self):
+        return f"Product {self.product_id} deleted from {self.shop} on {self.deleted_at}"
+
+
 class Sale(models.Model):
     shop = models.ForeignKey(Shop, on_delete=models.CASCADE, related_name="sales")  # NEW
     product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True, blank=True)
@@ -38,13 +71,26 @@ class Sale(models.Model):
     total_price = models.DecimalField(max_digits=10, decimal_places=2)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["shop", "created_at"], name="sale_shop_created_idx"),
+        ]
+
     def save(self, *args, **kwargs):
         if self.pk is None:
-            if self.product.quantity >= self.quantity_sold:
-                self.product.quantity -= self.quantity_sold
-                self.product.save()
-            else:
-                raise ValueError("Not enough stock")
+            from .utils import catalog_cache, stock_alerts
+            from .utils.rollups import record_sales
+            from .utils.stock import reserve_stock
+
+            with transaction.atomic():
+                if not reserve_stock(self.product_id, self.quantity_sold):
+                    raise ValueError("Not enough stock")
+                stock_alerts.evaluate([self.product_id])
+                super().save(*args, **kwargs)
+                record_sales([self])
+                catalog_cache.invalidate(self.shop_id)
+            self.product.refresh_from_db(fields=["quantity", "updated_at"])
+            return
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -53,12 +99,63 @@ class Sale(models.Model):
 
 
 
+class DailySalesRollup(models.Model):
+    # Per shop, per day, per product sales totals, kept in step with Sale by
+    # utils.rollups so dashboards read a few rows instead of scanning sales.
+    # Rebuild with `manage.py rebuild_sales_rollup`.
+    shop = models.ForeignKey(Shop, on_delete=models.CASCADE, related_name="daily_sales")
+    date = models.DateField()
+    product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True, blank=True)
+    quantity = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["shop", "date", "product"], name="daily_sales_rollup_unique"),
+        ]
+
+    def __str__(self):
+        return f"{self.shop} {self.date}: {self.quantity} sold, {self.revenue}"
+
+
+class ReplenishmentSuggestion(models.Model):
+    # Reorder suggestions per product, recomputed in bulk per shop by
+    # `manage.py compute_replenishment` and served as-is by the API
+    shop = models.ForeignKey(Shop, on_delete=models.CASCADE, related_name="replenishment_suggestions")
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, related_name="replenishment")
+    avg_daily_units = models.FloatField()
+    days_of_cover = models.FloatField(null=True, blank=True)  # None when the product is not selling
+    reorder_quantity = models.PositiveIntegerField()
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["shop", "days_of_cover"], name="replenish_shop_cover_idx"),
+        ]
+
+    def __str__(self):
+        return f"Reorder {self.reorder_quantity} of {self.product}"
+
 
 class StockAlert(models.Model):
+    # is_alerted is kept current by utils.stock_alerts.evaluate() whenever a
+    # sale, edit or import touches the product; shop is copied from the
+    # product so a shop's alerts come from the partial index alone.
     product = models.OneToOneField(Product, on_delete=models.CASCADE)
+    shop = models.ForeignKey(Shop, on_delete=models.CASCADE, related_name="stock_alerts", editable=False)
     threshold = models.PositiveIntegerField(default=2)  
     is_alerted = models.BooleanField(default=False)  
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["shop"], condition=models.Q(is_alerted=True), name="stockalert_shop_alerted_idx"),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.shop_id = self.product.shop_id
+        self.is_alerted = self.product.quantity <= self.threshold
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"Alert for {self.product.name} (Threshold: {self.threshold})"
 
@@ -77,6 +174,7 @@ class AuditLog(models.Model):
     ]
 
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
+    shop = models.ForeignKey(Shop, on_delete=models.SET_NULL, null=True, blank=True, related_name="audit_logs")
     action = models.CharField(max_length=10, choices=ACTION_CHOICES)
     model = models.CharField(max_length=50, null=True, blank=True)
     object_id = models.CharField(max_length=50, null=True, blank=True)
@@ -84,5 +182,16 @@ class AuditLog(models.Model):
     ip_address = models.GenericIPAddressField(null=True, blank=True)
     timestamp = models.DateTimeField(default=timezone.now)
 
+    class Meta:
+        # The audit log API pages on (timestamp, id); every filter it accepts
+        # has an index leading with that column so pages are range scans.
+        indexes = [
+            models.Index(fields=["timestamp", "id"], name="auditlog_ts_idx"),
+            models.Index(fields=["shop", "timestamp", "id"], name="auditlog_shop_ts_idx"),
+            models.Index(fields=["user", "timestamp", "id"], name="auditlog_user_ts_idx"),
+            models.Index(fields=["action", "timestamp", "id"], name="auditlog_action_ts_idx"),
+            models.Index(fields=["model", "timestamp", "id"], name="auditlog_model_ts_idx"),
+        ]
+
     def __str__(self):
         return f"{self.user} - {self.get_action_display()} - {self.model or ''} - {self.timestamp}"
\ No newline at end of file
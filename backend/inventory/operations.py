@@ -0,0 +1,23 @@
+from django.db import migrations
+
+# Custom migration operations. Migrations using them must set atomic = False.
+
+
+class AddIndexConcurrently(migrations.AddIndex):
+    # On Postgres, build the index with CREATE INDEX CONCURRENTLY so a large
+    # table stays writable while it builds; other backends get a plain
+    # CREATE INDEX. Needs a non-atomic migration.
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return super().database_forwards(app_label, schema_editor, from_state, to_state)
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            schema_editor.add_index(model, self.index, concurrently=True)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return super().database_backwards(app_label, schema_editor, from_state, to_state)
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            schema_editor.remove_index(model, self.index, concurrently=True)
@@ -0,0 +1,86 @@
+import base64
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.utils.urls import replace_query_param
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+# Keyset ("seek") pagination on (field, id), newest first. Unlike OFFSET
+# paging, each page is one index range scan that starts where the previous
+# page stopped, so page 10,000 costs the same as page 1.
+
+def encode_cursor(value, pk):
+    raw = f"{value.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        value, pk = raw.rsplit("|", 1)
+        value = parse_datetime(value)
+        if value is None:
+            raise ValueError
+        return value, int(pk)
+    except (ValueError, UnicodeDecodeError):
+        raise ValidationError({"cursor": "Invalid cursor"})
+
+
+def get_page_size(request, default=DEFAULT_PAGE_SIZE):
+    try:
+        page_size = int(request.query_params.get("page_size", default))
+    except ValueError:
+        raise ValidationError({"page_size": "Must be an integer"})
+    return max(1, min(page_size, MAX_PAGE_SIZE))
+
+
+def _keyset_query(request, queryset, field, page_size):
+    queryset = queryset.order_by(f"-{field}", "-id")
+
+    cursor = request.query_params.get("cursor")
+    if cursor:
+        value, pk = decode_cursor(cursor)
+        # The leading "<=" gives the planner a range to seek into; the OR only
+        # breaks ties on rows sharing the cursor's timestamp
+        queryset = queryset.filter(**{f"{field}__lte": value}).filter(
+            Q(**{f"{field}__lt": value}) | Q(id__lt=pk)
+        )
+
+    # Fetch one extra row to learn whether there is a next page without a COUNT
+    return queryset[:page_size + 1]
+
+
+def _keyset_result(request, rows, field, page_size):
+    next_url = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        # Rows may be model instances or .values() dicts
+        value, pk = (last[field], last["id"]) if isinstance(last, dict) else (getattr(last, field), last.id)
+        next_url = replace_query_param(request.build_absolute_uri(), "cursor", encode_cursor(value, pk))
+
+    return rows, next_url
+
+
+def keyset_page(request, queryset, field="timestamp", page_size=None):
+    page_size = page_size or get_page_size(request)
+    rows = list(_keyset_query(request, queryset, field, page_size))
+    return _keyset_result(request, rows, field, page_size)
+
+
+async def akeyset_page(request, queryset, field="timestamp", page_size=None):
+    page_size = page_size or get_page_size(request)
+    rows = [row async for row in _keyset_query(request, queryset, field, page_size)]
+    return _keyset_result(request, rows, field, page_size)
+
+
+class ProductPagination(PageNumberPagination):
+    # Opt-in: listProducts only pages when ?page= is given, so clients that
+    # expect the whole catalog as a plain list keep working
+    page_size = 100
+    page_size_query_param = "page_size"
+    max_page_size = MAX_PAGE_SIZE
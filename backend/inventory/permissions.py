@@ -1,13 +1,17 @@
 from rest_framework.permissions import BasePermission
+from .utils.roles import has_role, MANAGER, STOCK_CLERK, SALES_PERSON
+
+# Role checks share one cached lookup of the user's groups, so composing
+# them (IsManager | IsStockClerk | IsSalesPerson) costs at most one query.
 
 class IsManager(BasePermission):
     def has_permission(self, request, view):
-        return request.user.groups.filter(name='Manager').exists()
+        return has_role(request.user, MANAGER)
 
 class IsStockClerk(BasePermission):
     def has_permission(self, request, view):
-        return request.user.groups.filter(name='Stock Clerk').exists()
+        return has_role(request.user, STOCK_CLERK)
 
 class IsSalesPerson(BasePermission):
     def has_permission(self, request, view):
-        return request.user.groups.filter(name='Sales Person').exists()
\ No newline at end of file
+        return has_role(request.user, SALES_PERSON)
@@ -0,0 +1,41 @@
+from django.conf import settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:  # optional; DRF's stdlib encoder is used instead
+    orjson = None
+
+# JSONRenderer that encodes with orjson when it is installed and FAST_JSON is
+# on, producing the same output as DRF's encoder: anything orjson does not
+# handle the same way (Decimal, dates and times, lazy strings, querysets)
+# goes through DRF's JSONEncoder.default, so Decimals become floats and UTC
+# datetimes end in "Z" either way.
+
+_drf_default = encoders.JSONEncoder().default
+_options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS if orjson else 0
+
+
+def fast_json_enabled():
+    return orjson is not None and getattr(settings, 'FAST_JSON', True)
+
+
+def dumps(data):
+    # Compact UTF-8 JSON bytes, like JSONRenderer().render(data)
+    if not fast_json_enabled():
+        return JSONRenderer().render(data)
+    content = orjson.dumps(data, default=_drf_default, option=_options)
+    # Same as DRF: keep the output safe to embed in JavaScript
+    if b'\xe2\x80\xa8' in content or b'\xe2\x80\xa9' in content:
+        content = content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+    return content
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if not fast_json_enabled() or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        return dumps(data)
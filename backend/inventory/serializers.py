@@ -1,3 +1,5 @@
+from decimal import Decimal
+from django.utils import timezone
 from rest_framework import serializers
 from .models import Product, Sale, Category, AuditLog
 
@@ -12,7 +14,17 @@ class ProductSerializer(serializers.ModelSerializer):
         model = Product
         fields = "__all__"
 
-class ProductViewSerializer(serializers.ModelSerializer):
+class DynamicFieldsMixin:
+    # Pass fields=[...] to keep only those fields in the output
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop("fields", None)
+        super().__init__(*args, **kwargs)
+        if fields:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class ProductViewSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     category = CategorySerializer(read_only=True)
     shop_name = serializers.CharField(source="shop.name", read_only=True)
 
@@ -38,3 +50,70 @@ class AuditLogSerializer(serializers.ModelSerializer):
         fields = ['id', 'user', 'action', 'action_display', 'model', 'object_id', 'details', 'ip_address', 'timestamp']
 
 
+# Read-only fast path for large lists: output dicts built straight from
+# .values_list() rows, field for field and in the same order as
+# ProductViewSerializer / AuditLogSerializer (tests.FastSerializerTests keeps
+# them identical). No field objects are instantiated per row.
+
+CENTS = Decimal("0.01")
+PRODUCT_FIELDS = ("id", "category", "shop_name", "name", "quantity", "price", "created_at", "updated_at", "shop")
+PRODUCT_COLUMNS = ("id", "category_id", "category__name", "shop__name", "name", "quantity", "price",
+                   "created_at", "updated_at", "shop_id")
+AUDIT_LOG_COLUMNS = ("id", "user__username", "action", "model", "object_id", "details", "ip_address", "timestamp")
+ACTION_DISPLAY = dict(AuditLog.ACTION_CHOICES)
+
+
+def format_datetime(value):
+    # As DRF's DateTimeField: current time zone, ISO 8601, "Z" for UTC
+    if value is None:
+        return None
+    if timezone.is_aware(value):
+        value = timezone.localtime(value)
+    value = value.isoformat()
+    return value[:-6] + "Z" if value.endswith("+00:00") else value
+
+
+def product_values(queryset):
+    return queryset.values_list(*PRODUCT_COLUMNS)
+
+
+def product_dicts(rows, fields=None):
+    # rows from product_values(); fields= works like ProductViewSerializer's
+    keep = [f for f in PRODUCT_FIELDS if f in fields] if fields else None
+    data = []
+    for pk, category_id, category_name, shop_name, name, quantity, price, created_at, updated_at, shop_id in rows:
+        row = {
+            "id": pk,
+            "category": {"id": category_id, "name": category_name} if category_id is not None else None,
+            "shop_name": shop_name,
+            "name": name,
+            "quantity": quantity,
+            "price": format(price.quantize(CENTS), "f") if price is not None else None,
+            "created_at": format_datetime(created_at),
+            "updated_at": format_datetime(updated_at),
+            "shop": shop_id,
+        }
+        data.append({f: row[f] for f in keep} if keep else row)
+    return data
+
+
+def audit_log_values(queryset):
+    return queryset.values(*AUDIT_LOG_COLUMNS)
+
+
+def audit_log_dicts(rows):
+    # rows from audit_log_values(), e.g. a keyset page of them
+    return [
+        {
+            "id": row["id"],
+            "user": row["user__username"],
+            "action": row["action"],
+            "action_display": ACTION_DISPLAY.get(row["action"], row["action"]),
+            "model": row["model"],
+            "object_id": row["object_id"],
+            "details": row["details"],
+            "ip_address": row["ip_address"],
+            "timestamp": format_datetime(row["timestamp"]),
+        }
+        for row in rows
+    ]
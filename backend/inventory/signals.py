@@ -0,0 +1,70 @@
+from django.contrib.auth.models import Group, User
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+from .authentication import revoke_user, token_cache
+from .models import Shop
+from .utils import roles
+
+
+def forget_users(*user_ids):
+    # Cached roles live both in the role cache and on the users held by the
+    # token caches of every worker, so both have to go
+    roles.invalidate(*user_ids)
+    for user_id in user_ids:
+        revoke_user(user_id)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def user_groups_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        # user.groups.add/remove/clear(): instance is the user
+        if action.startswith('post_'):
+            forget_users(instance.pk)
+    elif action == 'pre_clear':
+        # group.user_set.clear() does not say which users it removes
+        instance._cleared_user_ids = list(instance.user_set.values_list('id', flat=True))
+    elif action == 'post_clear':
+        forget_users(*getattr(instance, '_cleared_user_ids', []))
+    elif action.startswith('post_') and pk_set:
+        forget_users(*pk_set)
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    # A renamed or deleted group changes the roles of everyone in it
+    forget_users(*instance.user_set.values_list('id', flat=True))
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, **kwargs):
+    # Covers password changes and deactivation
+    revoke_user(instance.pk)
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    # Logout; other workers learn of it through the user's revocation stamp
+    token_cache.pop(instance.key)
+    revoke_user(instance.user_id)
+
+
+@receiver(m2m_changed, sender=Shop.owner.through)
+def shop_owners_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    # Cached users carry the shops they own
+    if not reverse:
+        if action == 'pre_clear':
+            instance._cleared_owner_ids = list(instance.owner.values_list('id', flat=True))
+        elif action == 'post_clear':
+            forget_users(*getattr(instance, '_cleared_owner_ids', []))
+        elif action.startswith('post_') and pk_set:
+            forget_users(*pk_set)
+    elif action.startswith('post_'):
+        forget_users(instance.pk)
+
+
+@receiver(post_save, sender=Shop)
+@receiver(pre_delete, sender=Shop)
+def shop_changed(sender, instance, **kwargs):
+    forget_users(*instance.owner.values_list('id', flat=True))
@@ -0,0 +1,18 @@
+from contextlib import contextmanager
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+
+
+@contextmanager
+def assert_max_queries(budget, using=DEFAULT_DB_ALIAS):
+    # Like TestCase.assertNumQueries, but fails only when the block runs
+    # *more* queries than its budget, and lists them so N+1s are obvious:
+    #
+    #     with assert_max_queries(5):
+    #         client.get("/api/products/")
+    with CaptureQueriesContext(connections[using]) as context:
+        yield context
+
+    if len(context) > budget:
+        queries = "\n".join(f"{i}. {query['sql']}" for i, query in enumerate(context.captured_queries, 1))
+        raise AssertionError(f"{len(context)} queries executed, budget is {budget}:\n{queries}")
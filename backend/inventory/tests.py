@@ -1,3 +1,1100 @@
-from django.test import TestCase
+import gzip
+import io
+import json
+import os
+import tempfile
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock, skipIf
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import Group, User
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import DatabaseError, connection, connections
+from django.db.models import Sum
+from django.test import AsyncClient, AsyncRequestFactory, Client, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.timezone import now
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from .authentication import token_cache
+from .metrics import registry
+from .renderers import dumps
+from .models import AuditLog, Category, DailySalesRollup, Product, ProductTombstone, Sale, Shop, StockAlert
+from .testing import assert_max_queries
+from .utils import live, replenishment, rollups, sync
+from .utils.audit_sink import AuditSink
+from .utils.roles import user_roles
+from .utils.stock import reserve_stock
 
 # Create your tests here.
+
+
+# Tests must never touch the caches a running server uses (the file-based
+# 'shared' cache lives in the system temp directory)
+TEST_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "test-default"},
+    "shared": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "test-shared"},
+}
+
+
+@override_settings(AUDIT_LOG_ASYNC=False, CACHES=TEST_CACHES)
+class InventoryTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="manager", password="secret")
+        cls.user.groups.add(Group.objects.create(name="Manager"))
+        cls.shop = Shop.objects.create(name="Main Shop")
+        cls.shop.owner.add(cls.user)
+        cls.category = Category.objects.create(name="Drinks")
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        self.reset_caches()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+
+    def reset_caches(self):
+        for alias in settings.CACHES:
+            caches[alias].clear()
+        token_cache.clear()
+
+    def make_product(self, name="Cola", quantity=10, price="2.50"):
+        return Product.objects.create(
+            shop=self.shop, category=self.category, name=name, quantity=quantity, price=Decimal(price)
+        )
+
+
+class RecordSaleTests(InventoryTestCase):
+    def record(self, lines):
+        return self.client.post("/api/sales/record/", {"sales": lines}, format="json")
+
+    def test_basket_decrements_stock_and_logs_each_line(self):
+        cola = self.make_product("Cola", quantity=10)
+        water = self.make_product("Water", quantity=5, price="1.00")
+
+        response = self.record([
+            {"product_id": cola.id, "quantity": 3},
+            {"product_id": water.id, "quantity": 2},
+            {"product_id": cola.id, "quantity": 1},
+        ])
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data), 3)
+        cola.refresh_from_db()
+        water.refresh_from_db()
+        self.assertEqual(cola.quantity, 6)
+        self.assertEqual(water.quantity, 3)
+        self.assertEqual(Sale.objects.get(id=response.data[0]["id"]).total_price, Decimal("7.50"))
+        self.assertEqual(AuditLog.objects.filter(action="SALE").count(), 3)
+
+    def test_failed_line_rolls_back_whole_basket(self):
+        cola = self.make_product("Cola", quantity=10)
+        water = self.make_product("Water", quantity=1)
+
+        response = self.record([
+            {"product_id": cola.id, "quantity": 3},
+            {"product_id": water.id, "quantity": 2},
+        ])
+
+        self.assertEqual(response.status_code, 400)
+        cola.refresh_from_db()
+        self.assertEqual(cola.quantity, 10)
+        self.assertFalse(Sale.objects.exists())
+
+    def test_unknown_product_is_404(self):
+        response = self.record([{"product_id": 999, "quantity": 1}])
+        self.assertEqual(response.status_code, 404)
+
+    def test_query_count_does_not_grow_with_basket(self):
+        products = [self.make_product(f"P{i}", quantity=100) for i in range(20)]
+
+        with CaptureQueriesContext(connection) as small:
+            self.record([{"product_id": products[0].id, "quantity": 1}])
+        self.reset_caches()
+        with CaptureQueriesContext(connection) as large:
+            self.record([{"product_id": p.id, "quantity": 1} for p in products])
+
+        self.assertEqual(len(small), len(large))
+
+
+@skipIf(connection.vendor == "sqlite", "SQLite locks the whole table for writers; run against PostgreSQL")
+@override_settings(CACHES=TEST_CACHES)
+class ConcurrentStockTests(TransactionTestCase):
+    # Hammers one product from many threads, each with its own DB connection,
+    # and checks that every unit is accounted for: sold + remaining == initial.
+    THREADS = 8
+    ATTEMPTS = 25
+
+    def setUp(self):
+        shop = Shop.objects.create(name="Main Shop")
+        self.product = Product.objects.create(shop=shop, name="Hot SKU", quantity=100, price=Decimal("1.00"))
+
+    def hammer(self, worker):
+        sold = []
+        errors = []
+        start = threading.Barrier(self.THREADS)
+
+        def run():
+            try:
+                start.wait()
+                sold.append(sum(worker() for _ in range(self.ATTEMPTS)))
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=run) for _ in range(self.THREADS)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(errors, [])
+        self.product.refresh_from_db()
+        return sum(sold)
+
+    def test_parallel_reservations_never_oversell(self):
+        sold = self.hammer(lambda: 1 if reserve_stock(self.product.id, 1) else 0)
+
+        self.assertEqual(sold, 100)
+        self.assertEqual(self.product.quantity, 0)
+
+    def test_parallel_sales_never_lose_stock(self):
+        def sell():
+            try:
+                Sale.objects.create(shop_id=self.product.shop_id, product_id=self.product.id,
+                                    quantity_sold=1, total_price=Decimal("1.00"))
+                return 1
+            except ValueError:
+                return 0
+
+        sold = self.hammer(sell)
+
+        self.assertEqual(sold, Sale.objects.count())
+        self.assertEqual(sold + self.product.quantity, 100)
+
+
+class AuditSinkTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.spill_path = os.path.join(tmp.name, "spill.ndjson")
+        self.quarantine_path = os.path.join(tmp.name, "quarantine.ndjson")
+        self.enterContext(override_settings(AUDIT_LOG_SPILL_PATH=self.spill_path,
+                                            AUDIT_LOG_QUARANTINE_PATH=self.quarantine_path))
+        self.sink = AuditSink()
+
+    def entries(self, n):
+        return [AuditLog(action="VIEW", details={"n": i}) for i in range(n)]
+
+    def test_flush_writes_batch(self):
+        self.sink.flush(self.entries(3))
+        self.assertEqual(AuditLog.objects.count(), 3)
+
+    def test_failed_flush_spills_and_replays(self):
+        with mock.patch.object(AuditLog.objects, "bulk_create", side_effect=DatabaseError), \
+                self.assertLogs("inventory.utils.audit_sink", "ERROR"):
+            self.sink.flush(self.entries(2))
+        self.assertTrue(os.path.exists(self.spill_path))
+        self.assertFalse(AuditLog.objects.exists())
+
+        self.sink.flush(self.entries(1))
+
+        self.assertEqual(AuditLog.objects.count(), 3)
+        self.assertFalse(os.path.exists(self.spill_path))
+
+    def test_rejected_entries_are_quarantined_not_spilled(self):
+        bad = AuditLog(action=None)  # NOT NULL violation
+        with self.assertLogs("inventory.utils.audit_sink", "WARNING"):
+            self.sink.flush(self.entries(2) + [bad])
+        self.assertEqual(AuditLog.objects.count(), 2)
+        self.assertFalse(os.path.exists(self.spill_path))
+        with open(self.quarantine_path) as f:
+            self.assertEqual(len(f.readlines()), 1)
+
+    def test_replay_skips_torn_lines(self):
+        self.sink.spill(self.entries(2))
+        with open(self.spill_path, "a") as f:
+            f.write('{"user_id": null, "act')
+        with self.assertLogs("inventory.utils.audit_sink", "ERROR"):
+            self.sink.flush(self.entries(1))
+        self.assertEqual(AuditLog.objects.count(), 3)
+        self.assertFalse(os.path.exists(self.spill_path))
+
+    def test_shutdown_drains_queue(self):
+        for entry in self.entries(5):
+            self.sink.queue.put(entry)
+        self.sink.shutdown()
+        self.assertEqual(AuditLog.objects.count(), 5)
+
+
+class AuditLogListTests(InventoryTestCase):
+    def test_keyset_pages_cover_every_row_once(self):
+        AuditLog.objects.bulk_create([AuditLog(action="VIEW", shop=self.shop) for _ in range(7)])
+
+        seen = []
+        url = "/api/audit-logs/?page_size=3"
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen += [row["id"] for row in response.data["results"]]
+            url = response.data["next"]
+
+        self.assertEqual(sorted(seen, reverse=True), seen)
+        self.assertEqual(sorted(seen), sorted(AuditLog.objects.values_list("id", flat=True)))
+
+    def test_filters(self):
+        other = Shop.objects.create(name="Other")
+        AuditLog.objects.create(action="SALE", shop=self.shop, user=self.user)
+        AuditLog.objects.create(action="VIEW", shop=other)
+
+        response = self.client.get(f"/api/audit-logs/?shop={self.shop.id}&action=SALE")
+        self.assertEqual([row["action"] for row in response.data["results"]], ["SALE"])
+
+        response = self.client.get("/api/audit-logs/?since=not-a-date")
+        self.assertEqual(response.status_code, 400)
+
+    def test_only_own_shops_are_readable(self):
+        other = Shop.objects.create(name="Other")
+        AuditLog.objects.create(action="SALE", shop=self.shop)
+        AuditLog.objects.create(action="VIEW", shop=other)
+
+        response = self.client.get("/api/audit-logs/")
+        self.assertEqual([row["action"] for row in response.data["results"]], ["SALE"])
+        export = b"".join(self.client.get("/api/audit-logs/export/").streaming_content)
+        self.assertEqual([json.loads(line)["action"] for line in export.splitlines()], ["SALE"])
+
+        for url in ("/api/audit-logs/", "/api/audit-logs/export/"):
+            self.assertEqual(self.client.get(f"{url}?shop={other.id}").status_code, 404)
+
+
+class ExportTests(InventoryTestCase):
+    def content(self, response):
+        return b"".join(response.streaming_content)
+
+    def test_audit_log_ndjson(self):
+        AuditLog.objects.create(action="SALE", shop=self.shop, user=self.user, details={"n": 1})
+
+        response = self.client.get("/api/audit-logs/export/")
+
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        rows = [json.loads(line) for line in self.content(response).splitlines()]
+        self.assertEqual(rows[0]["user__username"], "manager")
+        self.assertEqual(rows[0]["details"], {"n": 1})
+
+    def test_sales_csv_gzip_only_includes_own_shop(self):
+        product = self.make_product(quantity=10)
+        Sale.objects.create(shop=self.shop, product=product, quantity_sold=2, total_price=Decimal("5.00"))
+        other = Shop.objects.create(name="Other")
+        Sale.objects.create(shop=other, product=self.make_product("Tea"), quantity_sold=1, total_price=Decimal("1.00"))
+
+        response = self.client.get("/api/sales/export/?output=csv&gzip=1")
+
+        lines = gzip.decompress(self.content(response)).decode().splitlines()
+        self.assertEqual(lines[0].split(","), ["id", "created_at", "shop_id", "product_id", "product__name",
+                                                "quantity_sold", "total_price"])
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[1].endswith(",Cola,2,5.00"))
+
+
+class SalesRollupTests(InventoryTestCase):
+    def test_sales_feed_rollup_and_counts(self):
+        cola = self.make_product("Cola", quantity=20)
+        water = self.make_product("Water", quantity=20, price="1.00")
+        Sale.objects.create(shop=self.shop, product=cola, quantity_sold=2, total_price=Decimal("5.00"))
+        self.client.post("/api/sales/record/", {"sales": [
+            {"product_id": cola.id, "quantity": 1},
+            {"product_id": water.id, "quantity": 3},
+        ]}, format="json")
+
+        row = DailySalesRollup.objects.get(product=cola)
+        self.assertEqual((row.quantity, row.revenue), (3, Decimal("7.50")))
+
+        with self.assertNumQueries(1):
+            totals = rollups.sales_totals(self.shop)
+        self.assertEqual(totals["daily_sales"], Decimal("10.50"))
+
+        response = self.client.get("/api/sales/counts/")
+        self.assertEqual(response.data, totals)
+
+    def test_rebuild_matches_incremental(self):
+        cola = self.make_product("Cola", quantity=20)
+        for _ in range(3):
+            Sale.objects.create(shop=self.shop, product=cola, quantity_sold=1, total_price=Decimal("2.50"))
+        before = list(DailySalesRollup.objects.values("date", "product", "quantity", "revenue"))
+
+        self.assertEqual(rollups.rebuild(self.shop), 1)
+        self.assertEqual(list(DailySalesRollup.objects.values("date", "product", "quantity", "revenue")), before)
+
+
+class SalesSeriesTests(InventoryTestCase):
+    def test_daily_buckets_grouped_by_product(self):
+        cola = self.make_product("Cola", quantity=50)
+        water = self.make_product("Water", quantity=50, price="1.00")
+        for product, days_ago, quantity in [(cola, 0, 1), (cola, 0, 2), (water, 0, 1), (cola, 2, 4)]:
+            sale = Sale.objects.create(shop=self.shop, product=product, quantity_sold=quantity,
+                                       total_price=quantity * product.price)
+            Sale.objects.filter(pk=sale.pk).update(created_at=sale.created_at - timedelta(days=days_ago))
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/sales/series/?interval=day&group_by=product")
+
+        self.assertEqual(response.status_code, 200)
+        rows = [(row["product_name"], row["units"], row["revenue"]) for row in response.data["results"]]
+        self.assertEqual(rows, [("Cola", 4, Decimal("10.00")), ("Cola", 3, Decimal("7.50")), ("Water", 1, Decimal("1.00"))])
+        self.assertEqual(len([q for q in queries if "inventory_sale" in q["sql"]]), 1)
+
+    def test_rejects_too_many_buckets(self):
+        response = self.client.get("/api/sales/series/?interval=hour&since=2020-01-01T00:00:00")
+        self.assertEqual(response.status_code, 400)
+
+    def test_impossible_dates_are_bad_requests(self):
+        # Well-formed, but parse_datetime raises ValueError for Feb 30
+        for url in ["/api/sales/series/", "/api/audit-logs/", "/api/audit-logs/export/", "/api/sales/export/"]:
+            with self.subTest(url=url):
+                response = self.client.get(f"{url}?since=2024-02-30T00:00")
+                self.assertEqual(response.status_code, 400)
+                self.assertIn("since", response.json())
+
+
+# Live streams end at once instead of staying open
+@override_settings(LIVE_STREAM_MAX_AGE=0)
+class QueryBudgetTests(InventoryTestCase):
+    # Every route in inventory/urls.py needs a budget here, so a new endpoint
+    # or an N+1 regression fails CI. The shop has 30 products with sales, so
+    # any per-row query would blow its budget.
+    BUDGETS = {
+        "dashboard/": 8,
+        "products/": 5,
+        "products/changes/": 4,
+        "products/add/": 6,
+        "products/<int:product_id>/": 3,
+        "products/edit/<int:product_id>/": 9,
+        "products/delete/<int:product_id>/": 12,
+        "sales/record/": 11,
+        "sales/counts/": 3,
+        "sales/export/": 4,
+        "sales/series/": 3,
+        "categories/": 2,
+        "stock/alerts/": 2,
+        "stock/replenishment/": 2,
+        "login/": 8,
+        "logout/": 3,
+        "shop/info/": 2,
+        "audit-logs/": 3,
+        "audit-logs/export/": 3,
+        "live/": 2,
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.products = [
+            Product.objects.create(shop=cls.shop, category=cls.category, name=f"P{i}", quantity=100, price=Decimal("1.00"))
+            for i in range(30)
+        ]
+        for product in cls.products:
+            Sale.objects.create(shop=cls.shop, product=product, quantity_sold=1, total_price=Decimal("1.00"))
+            AuditLog.objects.create(action="VIEW", shop=cls.shop, user=cls.user)
+
+    def requests(self):
+        product = self.products[0]
+        return {
+            "dashboard/": ("get", "/api/dashboard/", None),
+            "products/": ("get", "/api/products/", None),
+            "products/changes/": ("get", "/api/products/changes/", None),
+            "products/add/": ("post", "/api/products/add/",
+                              {"name": "New", "quantity": 1, "price": "1.00", "shop": self.shop.id}),
+            "products/<int:product_id>/": ("get", f"/api/products/{product.id}/", None),
+            "products/edit/<int:product_id>/": ("put", f"/api/products/edit/{product.id}/",
+                                                {"name": "Renamed", "quantity": 5, "price": "2.00",
+                                                 "shop": self.shop.id, "category": self.category.id}),
+            "products/delete/<int:product_id>/": ("delete", f"/api/products/delete/{self.products[1].id}/", None),
+            "sales/record/": ("post", "/api/sales/record/",
+                              {"sales": [{"product_id": p.id, "quantity": 1} for p in self.products[2:]]}),
+            "sales/counts/": ("get", "/api/sales/counts/", None),
+            "sales/export/": ("get", "/api/sales/export/?output=csv", None),
+            "sales/series/": ("get", "/api/sales/series/?group_by=category", None),
+            "categories/": ("get", "/api/categories/", None),
+            "stock/alerts/": ("get", "/api/stock/alerts/", None),
+            "stock/replenishment/": ("get", "/api/stock/replenishment/", None),
+            "login/": ("post", "/api/login/", {"username": "manager", "password": "secret"}),
+            "shop/info/": ("get", "/api/shop/info/", None),
+            "audit-logs/": ("get", "/api/audit-logs/", None),
+            "audit-logs/export/": ("get", "/api/audit-logs/export/", None),
+            "live/": ("get", "/api/live/", None),
+            # Last, since it revokes the token
+            "logout/": ("post", "/api/logout/", None),
+        }
+
+    def test_every_route_has_a_budget(self):
+        from .urls import urlpatterns
+        self.assertEqual({str(p.pattern) for p in urlpatterns}, set(self.BUDGETS))
+
+    def test_endpoints_stay_within_budget(self):
+        for route, (method, url, data) in self.requests().items():
+            with self.subTest(route=route), assert_max_queries(self.BUDGETS[route]):
+                response = getattr(self.client, method)(url, data, format="json")
+                if response.streaming:
+                    b"".join(response.streaming_content)
+                self.assertLess(response.status_code, 300, response.content if not response.streaming else "")
+
+    def test_product_list_query_count_is_flat(self):
+        with CaptureQueriesContext(connection) as before:
+            self.client.get("/api/products/")
+        for i in range(20):
+            self.make_product(f"Extra{i}")
+        self.reset_caches()
+        with CaptureQueriesContext(connection) as after:
+            self.client.get("/api/products/")
+        self.assertEqual(len(before), len(after))
+
+    def test_product_list_fields_and_pages(self):
+        response = self.client.get("/api/products/?fields=id,name,shop_name&page=2&page_size=20")
+        data = json.loads(response.content)
+        self.assertEqual(data["count"], 30)
+        self.assertEqual(len(data["results"]), 10)
+        self.assertEqual(set(data["results"][0]), {"id", "name", "shop_name"})
+
+
+class CatalogCacheTests(InventoryTestCase):
+    def test_unchanged_catalog_is_not_modified(self):
+        self.make_product()
+        first = self.client.get("/api/products/")
+        self.assertIn("ETag", first)
+
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.get("/api/products/", HTTP_IF_NONE_MATCH=first["ETag"])
+
+        self.assertEqual(second.status_code, 304)
+        self.assertFalse([q for q in queries if "inventory_product" in q["sql"]])
+
+    def test_writes_invalidate_catalog(self):
+        product = self.make_product(quantity=10)
+        etag = self.client.get("/api/products/")["ETag"]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post("/api/sales/record/", {"sales": [{"product_id": product.id, "quantity": 4}]},
+                             format="json")
+
+        response = self.client.get("/api/products/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(json.loads(response.content)[0]["quantity"], 6)
+
+    def test_variants_are_cached_separately(self):
+        self.make_product()
+        full = json.loads(self.client.get("/api/products/").content)
+        trimmed = json.loads(self.client.get("/api/products/?fields=id,name").content)
+        self.assertGreater(len(full[0]), 2)
+        self.assertEqual(set(trimmed[0]), {"id", "name"})
+
+
+    def test_every_bump_gives_a_new_version(self):
+        # Versions are database rows, seen by every worker and host, and each
+        # bump is its own atomic UPDATE, so concurrent writes never merge
+        from .utils import catalog_cache
+        self.assertEqual(catalog_cache.get_version(self.shop.id), 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            catalog_cache.invalidate(self.shop.id)
+            catalog_cache.invalidate(self.shop.id)
+        self.assertEqual(catalog_cache.get_version(self.shop.id), 2)
+
+    def test_per_process_invalidation_caches_are_flagged(self):
+        from .checks import shared_cache_check
+        self.assertEqual({w.id for w in shared_cache_check(None)}, {"inventory.W001"})
+        shared = {**settings.CACHES, "shared": {"BACKEND": "django.core.cache.backends.redis.RedisCache"}}
+        with self.settings(CACHES=shared):
+            self.assertEqual(shared_cache_check(None), [])
+
+
+class ProductChangesTests(InventoryTestCase):
+    def test_delta_since_cursor(self):
+        kept = self.make_product("Kept")
+        edited = self.make_product("Edited")
+        removed = self.make_product("Removed")
+
+        first = self.client.get("/api/products/changes/").data
+        self.assertTrue(first["full"])
+        self.assertEqual(len(first["changed"]), 3)
+
+        # Step past the cursor's overlap window
+        Product.objects.update(updated_at=now() - timedelta(minutes=1))
+        edited.quantity = 99
+        edited.save()
+        self.client.delete(f"/api/products/delete/{removed.id}/")
+        new = self.make_product("New")
+
+        delta = self.client.get("/api/products/changes/", {"since": first["cursor"]}).data
+        self.assertFalse(delta["full"])
+        self.assertEqual(sorted(p["id"] for p in delta["changed"]), [edited.id, new.id])
+        self.assertEqual(delta["deleted"], [removed.id])
+        self.assertNotIn(kept.id, [p["id"] for p in delta["changed"]])
+
+    def test_expired_tombstones_are_pruned(self):
+        other = Shop.objects.create(name="Other")
+        old = now() - sync.TOMBSTONE_RETENTION - timedelta(days=1)
+        ProductTombstone.objects.bulk_create([
+            ProductTombstone(shop=self.shop, product_id=1, deleted_at=old),
+            ProductTombstone(shop=self.shop, product_id=2, deleted_at=now() - timedelta(days=1)),
+            ProductTombstone(shop=other, product_id=3, deleted_at=old),
+        ])
+
+        product = self.make_product()
+        self.client.delete(f"/api/products/delete/{product.id}/")
+
+        # Only this shop's expired tombstones go; the other shop prunes its own
+        self.assertEqual(sorted(ProductTombstone.objects.values_list("product_id", flat=True)),
+                         sorted([2, 3, product.id]))
+
+    def test_bad_cursor(self):
+        response = self.client.get("/api/products/changes/", {"since": "garbage"})
+        self.assertEqual(response.status_code, 400)
+
+
+class RoleTests(InventoryTestCase):
+    def roles_queries(self, queries):
+        return [q for q in queries if "auth_group" in q["sql"]]
+
+    def test_composed_permissions_cost_one_query_then_none(self):
+        product = self.make_product()
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(f"/api/products/{product.id}/")
+        self.assertEqual(len(self.roles_queries(queries)), 1)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(f"/api/products/{product.id}/")
+        self.assertEqual(self.roles_queries(queries), [])
+
+    def test_group_changes_invalidate(self):
+        self.assertEqual(user_roles(User.objects.get(pk=self.user.pk)), ("Manager",))
+
+        clerk = Group.objects.create(name="Stock Clerk")
+        self.user.groups.add(clerk)
+        self.assertEqual(user_roles(User.objects.get(pk=self.user.pk)), ("Manager", "Stock Clerk"))
+
+        clerk.user_set.clear()
+        self.assertEqual(user_roles(User.objects.get(pk=self.user.pk)), ("Manager",))
+
+        Group.objects.filter(name="Manager").get().delete()
+        self.assertEqual(user_roles(User.objects.get(pk=self.user.pk)), ())
+
+
+class TokenCacheTests(InventoryTestCase):
+    def auth_queries(self, queries):
+        return [q for q in queries if "authtoken_token" in q["sql"]]
+
+    def test_cache_hit_skips_token_lookup(self):
+        self.client.get("/api/shop/info/")
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/shop/info/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.auth_queries(queries), [])
+
+    def test_logout_revokes_cached_token(self):
+        self.client.get("/api/shop/info/")
+        self.client.post("/api/logout/")
+        self.assertEqual(self.client.get("/api/shop/info/").status_code, 401)
+
+    def test_password_change_drops_cached_user(self):
+        self.client.get("/api/shop/info/")
+        self.user.set_password("changed")
+        self.user.save()
+        self.assertEqual(token_cache.entries, {})
+
+    def test_logout_in_another_worker_revokes_cached_token(self):
+        self.client.get("/api/shop/info/")
+        cached = dict(token_cache.entries)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post("/api/logout/")
+        token_cache.entries.update(cached)  # as if the logout ran elsewhere
+        self.assertEqual(self.client.get("/api/shop/info/").status_code, 401)
+
+    def test_role_change_in_another_worker_reaches_cached_user(self):
+        product = {"name": "New", "quantity": 1, "price": "1.00", "shop": self.shop.id}
+        self.assertEqual(self.client.post("/api/products/add/", product, format="json").status_code, 201)
+        cached = dict(token_cache.entries)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.groups.clear()
+        token_cache.entries.update(cached)
+        self.assertEqual(self.client.post("/api/products/add/", product, format="json").status_code, 403)
+
+    def test_idle_token_expires(self):
+        Token.objects.filter(pk=self.token.pk).update(created=now() - timedelta(days=30))
+        self.assertEqual(self.client.get("/api/shop/info/").status_code, 401)
+        self.assertFalse(Token.objects.filter(pk=self.token.pk).exists())
+
+    def test_login_restarts_idle_timer(self):
+        Token.objects.filter(pk=self.token.pk).update(created=now() - timedelta(days=30))
+        self.client.post("/api/login/", {"username": "manager", "password": "secret"})
+        self.assertEqual(self.client.get("/api/shop/info/").status_code, 200)
+
+
+class ShopResolutionTests(InventoryTestCase):
+    def test_shop_resolved_without_queries_on_cache_hit(self):
+        self.client.get("/api/shop/info/")
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/shop/info/")
+        self.assertEqual(response.data, {"shop_id": self.shop.id, "shop_name": "Main Shop"})
+        self.assertEqual(len(queries), 0)
+
+    def test_multi_shop_owner_must_choose(self):
+        second = Shop.objects.create(name="Second Shop")
+        second.owner.add(self.user)
+
+        self.assertEqual(self.client.get("/api/shop/info/").status_code, 400)
+        response = self.client.get("/api/shop/info/", HTTP_X_SHOP_ID=str(second.id))
+        self.assertEqual(response.data["shop_name"], "Second Shop")
+
+        other = Shop.objects.create(name="Not Mine")
+        response = self.client.get("/api/shop/info/", HTTP_X_SHOP_ID=str(other.id))
+        self.assertEqual(response.status_code, 404)
+
+    def test_products_scoped_to_selected_shop(self):
+        product = self.make_product()
+        second = Shop.objects.create(name="Second Shop")
+        second.owner.add(self.user)
+
+        response = self.client.get(f"/api/products/{product.id}/", HTTP_X_SHOP_ID=str(second.id))
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get(f"/api/products/{product.id}/", HTTP_X_SHOP_ID=str(self.shop.id))
+        self.assertEqual(response.status_code, 200)
+
+
+class ImportProductsTests(InventoryTestCase):
+    def setUp(self):
+        super().setUp()
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+
+    def write_csv(self, text, name="products.csv"):
+        path = os.path.join(self.dir, name)
+        with open(path, "w") as f:
+            f.write(text)
+        return path
+
+    def test_upserts_by_shop_and_name(self):
+        existing = self.make_product(name="Cola", quantity=1, price="1.00")
+        other_shop = Shop.objects.create(name="Other Shop")
+        Product.objects.create(shop=other_shop, name="Cola", quantity=9, price="9.00")
+        path = self.write_csv("Product,Qty,Price\nCola,12,2.50\nWater,3,0.99\n,1,1\nJuice,x,1.00\n")
+
+        out, err = io.StringIO(), io.StringIO()
+        call_command(
+            "import_products", path, shop=self.shop.id, category=self.category.id,
+            columns="name=Product,quantity=Qty,price=Price", chunk_size=1, workers=1, stdout=out, stderr=err,
+        )
+
+        existing.refresh_from_db()
+        self.assertEqual((existing.quantity, existing.price), (12, Decimal("2.50")))
+        water = Product.objects.get(shop=self.shop, name="Water")
+        self.assertEqual((water.quantity, water.category), (3, self.category))
+        self.assertEqual(Product.objects.get(shop=other_shop).quantity, 9)
+        self.assertIn("1 created, 1 updated, 2 rejected", out.getvalue())
+        self.assertIn("products.csv:5: bad quantity", err.getvalue())
+
+    def test_legacy_column_order(self):
+        path = self.write_csv("Qty,Item,Cost\n4,Tea,1.20\n")
+        call_command("import_products", path, shop=self.shop.id, workers=1, stdout=io.StringIO())
+        self.assertEqual(Product.objects.get(name="Tea").quantity, 4)
+
+    def test_directory_parsed_in_worker_pool(self):
+        self.write_csv("name,quantity,price\nCola,1,1.00\nTea,2,1.00\n", name="a.csv")
+        self.write_csv("name,quantity,price\nCola,5,1.50\nbad,,\n", name="b.csv")
+        self.write_csv("not a product file", name="notes.txt")
+
+        out = io.StringIO()
+        call_command("import_products", self.dir, shop=self.shop.id, workers=2, stdout=out, stderr=io.StringIO())
+
+        # b.csv comes after a.csv, so its Cola row wins
+        self.assertEqual(Product.objects.get(name="Cola").quantity, 5)
+        self.assertIn("from 2 files", out.getvalue())
+        self.assertIn("2 created, 1 updated, 1 rejected", out.getvalue())
+
+    def test_corrupt_workbook_is_rejected_not_fatal(self):
+        self.write_csv("name,quantity,price\nCola,1,1.00\n", name="a.csv")
+        with open(os.path.join(self.dir, "b.xlsx"), "wb") as f:
+            f.write(b"PK\x03\x04 not really a workbook")
+
+        for workers in (1, 2):
+            with self.subTest(workers=workers):
+                out, err = io.StringIO(), io.StringIO()
+                call_command("import_products", self.dir, shop=self.shop.id, workers=workers, stdout=out, stderr=err)
+                self.assertIn("b.xlsx: Not a readable workbook", err.getvalue())
+                self.assertIn("from 2 files", out.getvalue())
+                self.assertEqual(Product.objects.get(name="Cola").quantity, 1)
+
+    def test_files_are_read_in_bounded_chunks(self):
+        from .utils.importer import read_chunks
+        path = self.write_csv("name,quantity,price\n" + "".join(f"P{i},1,1.00\n" for i in range(7)) + "bad,x,1\n")
+        chunks = list(read_chunks(path, size=3))
+        self.assertEqual([len(rows) + len(errors) for rows, errors in chunks], [3, 3, 2])
+        self.assertEqual(chunks[-1][1], [(9, "bad quantity 'x'")])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class SeedDataTests(TestCase):
+    def test_seeds_numbered_shops(self):
+        call_command("seed_data", products=20, sales=50, audit_logs=30, shops=2, stdout=io.StringIO())
+
+        for n in (1, 2):
+            shop = Shop.objects.get(name=f"Bench Shop {n}")
+            self.assertTrue(shop.owner.filter(username=f"bench{n}").exists())
+            self.assertEqual(shop.products.count(), 20)
+            self.assertEqual(Sale.objects.filter(shop=shop).count(), 50)
+            self.assertEqual(AuditLog.objects.filter(shop=shop).count(), 30)
+            self.assertEqual(DailySalesRollup.objects.filter(shop=shop).aggregate(n=Sum("quantity"))["n"],
+                             Sale.objects.filter(shop=shop).aggregate(n=Sum("quantity_sold"))["n"])
+
+
+class StockAlertTests(InventoryTestCase):
+    def test_alerts_follow_sales_and_edits(self):
+        cola = self.make_product(name="Cola", quantity=5)
+        tea = self.make_product(name="Tea", quantity=50)
+        StockAlert.objects.create(product=cola, threshold=3)
+        StockAlert.objects.create(product=tea, threshold=3)
+        self.assertEqual(self.client.get("/api/stock/alerts/").data, [])
+
+        self.client.post("/api/sales/record/", {"sales": [{"product_id": cola.id, "quantity": 2}]}, format="json")
+        response = self.client.get("/api/stock/alerts/")
+        self.assertEqual(response.data, [{"product_id": cola.id, "product_name": "Cola", "quantity": 3, "threshold": 3}])
+
+        self.client.put(f"/api/products/edit/{cola.id}/", {
+            "name": "Cola", "quantity": 40, "price": "2.50", "shop": self.shop.id, "category": self.category.id,
+        }, format="json")
+        self.assertEqual(self.client.get("/api/stock/alerts/").data, [])
+
+    def test_sale_save_evaluates_alert(self):
+        cola = self.make_product(name="Cola", quantity=5)
+        alert = StockAlert.objects.create(product=cola, threshold=3)
+        self.assertEqual(alert.shop, self.shop)
+        Sale.objects.create(shop=self.shop, product=cola, quantity_sold=4, total_price=Decimal("10.00"))
+        alert.refresh_from_db()
+        self.assertTrue(alert.is_alerted)
+
+
+class ReplenishmentTests(InventoryTestCase):
+    def test_suggestions_from_sales_velocity(self):
+        cola = self.make_product(name="Cola", quantity=100)
+        tea = self.make_product(name="Tea", quantity=100)
+        self.make_product(name="Juice", quantity=100)
+        Product.objects.filter(pk__in=[cola.pk, tea.pk]).update(created_at=now() - timedelta(days=60))
+        today = timezone.localdate()
+        DailySalesRollup.objects.bulk_create([
+            DailySalesRollup(shop=self.shop, date=today - timedelta(days=d), product=cola, quantity=10, revenue=25)
+            for d in range(28)
+        ] + [DailySalesRollup(shop=self.shop, date=today - timedelta(days=40), product=tea, quantity=500, revenue=1)])
+
+        self.assertEqual(replenishment.compute(self.shop, today=today), 3)
+
+        response = self.client.get("/api/stock/replenishment/")
+        self.assertEqual(len(response.data), 1)
+        suggestion = response.data[0]
+        # 10/day: 100 in stock is 10 days of cover; 21 days needs 210
+        self.assertEqual(suggestion["product_name"], "Cola")
+        self.assertEqual((suggestion["avg_daily_units"], suggestion["days_of_cover"]), (10.0, 10.0))
+        self.assertEqual(suggestion["reorder_quantity"], 110)
+
+
+class PerformanceMetricsTests(InventoryTestCase):
+    def setUp(self):
+        super().setUp()
+        registry.clear()
+
+    @override_settings(METRICS_TOKEN="scrape")
+    def test_request_metrics_exposed(self):
+        self.make_product()
+        self.client.get("/api/categories/")
+
+        body = Client().get("/metrics", HTTP_AUTHORIZATION="Bearer scrape").content.decode()
+        self.assertIn('inventory_request_duration_seconds_count{method="GET",status="2xx",view="api/categories/"} 1', body)
+        self.assertIn('inventory_db_queries_count{view="api/categories/"} 1', body)
+        self.assertIn('inventory_render_duration_seconds_count{view="api/categories/"} 1', body)
+        self.assertIn('inventory_response_bytes_bucket{view="api/categories/",le="+Inf"} 1', body)
+
+    @override_settings(METRICS_TOKEN="scrape")
+    def test_metrics_token(self):
+        scraper = Client()
+        self.assertEqual(scraper.get("/metrics").status_code, 401)
+        self.assertEqual(scraper.get("/metrics", HTTP_AUTHORIZATION="Bearer scrape").status_code, 200)
+
+    @override_settings(METRICS_TOKEN=None)
+    def test_metrics_hidden_without_token(self):
+        self.assertEqual(Client().get("/metrics").status_code, 404)
+        with self.settings(DEBUG=True):
+            self.assertEqual(Client().get("/metrics").status_code, 200)
+
+    @override_settings(PERF_SLOW_REQUEST_THRESHOLD=0, PERF_SLOW_REQUEST_SAMPLE_RATE=1)
+    def test_slow_requests_logged_with_sql(self):
+        with self.assertLogs("inventory.performance", "WARNING") as logs:
+            self.client.get("/api/categories/")
+        self.assertIn("Slow request GET /api/categories/", logs.output[0])
+        self.assertIn("inventory_category", logs.output[0])
+
+
+class DashboardTests(InventoryTestCase):
+    def test_one_response_for_page_load(self):
+        cola = self.make_product()
+        Sale.objects.create(shop=self.shop, product=cola, quantity_sold=2, total_price=Decimal("5.00"))
+
+        response = self.client.get("/api/dashboard/")
+        data = json.loads(response.content)
+        self.assertEqual(data["shop"], {"shop_id": self.shop.id, "shop_name": "Main Shop"})
+        self.assertEqual(data["sales"]["daily_sales"], 5.0)
+        self.assertEqual(data["categories"], [{"id": self.category.id, "name": "Drinks"}])
+        self.assertEqual([p["name"] for p in data["catalog"]["changed"]], ["Cola"])
+        self.assertTrue(data["catalog"]["full"])
+
+        # Cached per shop: only the catalog version is read and the audit
+        # entry written
+        with CaptureQueriesContext(connection) as queries:
+            cached = self.client.get("/api/dashboard/")
+        self.assertEqual(cached.content, response.content)
+        self.assertEqual(len(queries), 2)
+        self.assertEqual(self.client.get("/api/dashboard/", HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 304)
+
+        # A sale changes the payload
+        with self.captureOnCommitCallbacks(execute=True):
+            Sale.objects.create(shop=self.shop, product=cola, quantity_sold=1, total_price=Decimal("2.50"))
+        data = json.loads(self.client.get("/api/dashboard/").content)
+        self.assertEqual(data["sales"]["daily_sales"], 7.5)
+
+    def test_sections_and_delta(self):
+        cursor = json.loads(self.client.get("/api/dashboard/?include=catalog").content)["catalog"]["cursor"]
+        self.make_product(name="Tea")
+
+        response = self.client.get(f"/api/dashboard/?include=catalog&since={cursor}")
+        data = json.loads(response.content)
+        self.assertEqual(set(data), {"catalog"})
+        self.assertFalse(data["catalog"]["full"])
+        self.assertEqual([p["name"] for p in data["catalog"]["changed"]], ["Tea"])
+        self.assertEqual(self.client.get("/api/dashboard/?include=nope").status_code, 400)
+
+
+class RenderingTests(InventoryTestCase):
+    def test_fast_json_matches_drf(self):
+        from rest_framework.renderers import JSONRenderer
+        data = {"price": Decimal("2.50"), "at": now(), "day": now().date(), "name": "Caf\u00e9 \u2028", "n": [1, None]}
+        self.assertEqual(dumps(data), JSONRenderer().render(data))
+
+    def test_large_responses_compressed_on_request(self):
+        for i in range(30):
+            self.make_product(name=f"Product {i}")
+
+        plain = self.client.get("/api/products/")
+        self.assertFalse(plain.has_header("Content-Encoding"))
+
+        response = self.client.get("/api/products/", HTTP_ACCEPT_ENCODING="gzip, deflate")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(json.loads(gzip.decompress(response.content)), json.loads(plain.content))
+        self.assertIn("Accept-Encoding", response["Vary"])
+
+        # The weakened ETag still revalidates
+        self.assertTrue(response["ETag"].startswith('W/"'))
+        revalidated = self.client.get("/api/products/", HTTP_IF_NONE_MATCH=response["ETag"], HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(revalidated.status_code, 304)
+
+    def test_small_or_refused_responses_left_alone(self):
+        self.assertFalse(self.client.get("/api/shop/info/", HTTP_ACCEPT_ENCODING="gzip").has_header("Content-Encoding"))
+        for i in range(30):
+            self.make_product(name=f"Product {i}")
+        response = self.client.get("/api/products/", HTTP_ACCEPT_ENCODING="gzip;q=0, identity")
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+
+class FastSerializerTests(InventoryTestCase):
+    def test_product_dicts_match_serializer(self):
+        from .serializers import ProductViewSerializer, product_dicts, product_values
+        self.make_product(name="Cola", price="2.5")
+        Product.objects.create(shop=self.shop, name="Loose", quantity=0, price=Decimal("10"))
+        products = Product.objects.filter(shop=self.shop).order_by("id")
+
+        expected = ProductViewSerializer(products.select_related("category", "shop"), many=True).data
+        self.assertEqual(json.dumps(product_dicts(product_values(products))), json.dumps(expected))
+
+        fields = ["price", "id", "shop_name"]
+        expected = ProductViewSerializer(products.select_related("category", "shop"), many=True, fields=fields).data
+        self.assertEqual(json.dumps(product_dicts(product_values(products), fields)), json.dumps(expected))
+
+    def test_audit_log_dicts_match_serializer(self):
+        from .serializers import AuditLogSerializer, audit_log_dicts, audit_log_values
+        AuditLog.objects.create(user=self.user, shop=self.shop, action="SALE", model="Sale", object_id="1",
+                                details={"n": 1}, ip_address="10.0.0.1")
+        AuditLog.objects.create(action="VIEW")
+        logs = AuditLog.objects.order_by("id")
+
+        expected = AuditLogSerializer(logs.select_related("user"), many=True).data
+        self.assertEqual(json.dumps(audit_log_dicts(audit_log_values(logs))), json.dumps(expected))
+
+
+class AsyncViewTests(InventoryTestCase):
+    def get(self, path, token=None, method="get"):
+        key = (token or self.token).key
+        return getattr(AsyncRequestFactory(), method)(path, headers={"Authorization": f"Token {key}"})
+
+    async def call(self, view, path):
+        return await view(self.get(path))
+
+    async def test_responses_match_sync_views(self):
+        from . import async_views
+        product = await sync_to_async(self.make_product)()
+        await Sale.objects.acreate(shop=self.shop, product=product, quantity_sold=2, total_price=Decimal("5.00"))
+        for view, path in [
+            (async_views.listProducts, "/api/products/"),
+            (async_views.listProducts, "/api/products/?fields=id,name&page=1"),
+            (async_views.salesCount, "/api/sales/counts/"),
+            (async_views.getShopInfo, "/api/shop/info/"),
+            (async_views.auditLogList, "/api/audit-logs/?limit=1"),
+        ]:
+            with self.subTest(path=path):
+                await sync_to_async(self.reset_caches)()
+                response = await self.call(view, path)
+                await sync_to_async(self.reset_caches)()
+                expected = await sync_to_async(self.client.get)(path)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(json.loads(response.content), expected.json())
+
+    async def test_errors(self):
+        from . import async_views
+        response = await async_views.getShopInfo(AsyncRequestFactory().get("/api/shop/info/"))
+        self.assertEqual(response.status_code, 401)
+        self.assertIn("WWW-Authenticate", response)
+
+        response = await async_views.getShopInfo(self.get("/api/shop/info/", method="post"))
+        self.assertEqual(response.status_code, 405)
+
+        clerk = await User.objects.acreate(username="clerk")
+        token = await Token.objects.acreate(user=clerk)
+        response = await async_views.auditLogList(self.get("/api/audit-logs/", token))
+        self.assertEqual(response.status_code, 403)
+
+        response = await async_views.auditLogList(self.get("/api/audit-logs/?since=2024-02-30T00:00"))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("since", json.loads(response.content))
+
+        response = await async_views.listProducts(self.get("/api/products/?page=9"))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_views_log_audit_entries(self):
+        from . import async_views
+        await self.call(async_views.listProducts, "/api/products/")
+        self.assertTrue(await AuditLog.objects.filter(action="VIEW", model="Product").aexists())
+
+    def test_hybrid_middleware_needs_both_paths(self):
+        from .middleware import HybridMiddleware
+
+        class SyncOnly(HybridMiddleware):
+            def handle(self, request):
+                return self.get_response(request)
+
+        with self.assertRaises(TypeError):
+            SyncOnly(lambda request: None)
+
+    async def test_performance_middleware_times_async_views(self):
+        from . import async_views
+        from .middleware import PerformanceMiddleware
+        await sync_to_async(registry.clear)()
+        middleware = PerformanceMiddleware(async_views.salesCount)
+        response = await middleware(self.get("/api/sales/counts/"))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('inventory_db_queries_count{view="unmatched"} 1', registry.render())
+
+
+class LiveEventsTests(InventoryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.broker = live.get_broker()
+        self.subscription = self.broker.subscribe(self.shop.id)
+        self.addCleanup(self.broker.unsubscribe, self.subscription)
+
+    def test_sale_is_pushed_after_commit(self):
+        product = self.make_product(quantity=10)
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.client.post("/api/sales/record/", {"sales": [{"product_id": product.id, "quantity": 3}]},
+                             format="json")
+        self.assertEqual(self.subscription.drain(), [])
+
+        for callback in callbacks:
+            callback()
+        [event] = self.subscription.drain()
+        self.assertEqual(event["type"], "sale")
+        self.assertEqual(event["data"]["stock"], [{"id": product.id, "quantity": 7}])
+        self.assertEqual(event["data"]["totals"], rollups.sales_totals(self.shop))
+        self.assertEqual(event["data"]["sales"][0]["quantity_sold"], 3)
+
+    def test_failed_sale_publishes_nothing(self):
+        product = self.make_product(quantity=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post("/api/sales/record/",
+                                        {"sales": [{"product_id": product.id, "quantity": 5}]}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.subscription.drain(), [])
+
+    def test_product_edits_and_deletes_are_pushed(self):
+        product = self.make_product()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.put(f"/api/products/edit/{product.id}/",
+                            {"name": "Cola", "quantity": 4, "price": "3.00", "shop": self.shop.id,
+                             "category": self.category.id}, format="json")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f"/api/products/delete/{product.id}/")
+        edited, deleted = self.subscription.drain()
+        self.assertEqual((edited["type"], edited["data"]["id"], edited["data"]["quantity"]),
+                         ("product", product.id, 4))
+        self.assertEqual(deleted, {"type": "product_deleted", "data": {"id": product.id}})
+
+    def test_events_are_only_built_for_shops_with_listeners(self):
+        other = Shop.objects.create(name="Other")
+        build = mock.Mock(return_value={})
+        with self.captureOnCommitCallbacks(execute=True):
+            live.publish(other.id, "sale", build)
+            live.publish(self.shop.id, "sale", build)
+        build.assert_called_once()
+
+    @override_settings(LIVE_EVENTS_BROKER="inventory.utils.live.RedisBroker")
+    def test_broker_failures_never_fail_committed_writes(self):
+        product = self.make_product(quantity=10)
+        with mock.patch.object(live, "_broker", None), mock.patch.object(live, "redis", None), \
+                self.assertLogs("inventory.utils.live", "ERROR"), self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post("/api/sales/record/",
+                                        {"sales": [{"product_id": product.id, "quantity": 3}]}, format="json")
+        self.assertEqual(response.status_code, 201)
+        product.refresh_from_db()
+        self.assertEqual(product.quantity, 7)
+
+    @override_settings(LIVE_EVENTS_QUEUE_SIZE=2)
+    def test_slow_client_is_told_to_resync(self):
+        for i in range(3):
+            self.broker.deliver(self.shop.id, {"type": "product_deleted", "data": {"id": i}})
+        self.assertEqual([e["type"] for e in self.subscription.drain()], ["resync"])
+
+    def test_wsgi_requests_get_no_stream(self):
+        # A stream would hold a sync worker; clients fall back to fetching
+        response = self.client.get("/api/live/")
+        self.assertEqual(response.status_code, 204)
+        self.broker.unsubscribe(self.subscription)
+        self.assertFalse(self.broker.listening(self.shop.id))
+
+    @override_settings(LIVE_STREAM_HEARTBEAT=5)
+    async def test_async_stream(self):
+        chunks = live.astream(self.shop.id)
+        self.assertEqual(await anext(chunks), b"retry: 3000\n\n")
+
+        # Published from another thread, as a committing request would
+        thread = threading.Thread(target=self.broker.deliver,
+                                  args=(self.shop.id, {"type": "resync", "data": {}}))
+        thread.start()
+        self.assertEqual(await anext(chunks), b"event: resync\ndata: {}\n\n")
+        thread.join()
+        await chunks.aclose()
+
+    @override_settings(LIVE_STREAM_MAX_AGE=0)
+    async def test_asgi_requests_get_the_async_stream(self):
+        response = await AsyncClient().get("/api/live/", headers={"Authorization": f"Token {self.token.key}"})
+        self.assertTrue(response.is_async)
+        self.assertEqual([chunk async for chunk in response.streaming_content], [b"retry: 3000\n\n"])
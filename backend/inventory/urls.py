@@ -1,9 +1,17 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
+
+# Read-heavy views have async versions for ASGI deployments
+reads = views
+if getattr(settings, "ASYNC_VIEWS", False):
+    from . import async_views as reads
 
 urlpatterns = [
     # ✅ Product URLs
-    path("products/", views.listProducts),
+    path("dashboard/", views.dashboard),
+    path("products/", reads.listProducts),
+    path("products/changes/", views.productChanges),
     path("products/add/", views.createProduct),
     path("products/<int:product_id>/", views.productDetail),
     path("products/edit/<int:product_id>/", views.editProduct),
@@ -11,13 +19,20 @@ urlpatterns = [
 
     # ✅ Sales URL
     path("sales/record/", views.recordSale),
-    path('sales/counts/', views.salesCount),
+    path('sales/counts/', reads.salesCount),
+    path("sales/export/", views.exportSales),
+    path("sales/series/", views.salesSeries),
     path("categories/", views.listCategories),
+    path("stock/alerts/", views.stockAlerts),
+    path("stock/replenishment/", views.replenishmentSuggestions),
 
 
     path("login/", views.loginView),
     path("logout/", views.logoutView),
-    path("shop/info/", views.getShopInfo),
+    path("shop/info/", reads.getShopInfo),
+
+    path("audit-logs/", reads.auditLogList),
+    path("audit-logs/export/", views.exportAuditLogs),
 
-    path("audit-logs/", views.auditLogList)
+    path("live/", async_views.liveEvents),
 ]
\ No newline at end of file
@@ -0,0 +1,42 @@
+from datetime import timedelta
+from django.db.models import Sum
+from django.db.models.functions import Trunc
+from ..models import Sale
+
+INTERVALS = {
+    "hour": timedelta(hours=1),
+    "day": timedelta(days=1),
+    "week": timedelta(weeks=1),
+    "month": timedelta(days=31),
+}
+
+GROUPS = {
+    "product": {"product_id": "product_id", "product_name": "product__name"},
+    "category": {"category_id": "product__category_id", "category_name": "product__category__name"},
+}
+
+MAX_BUCKETS = 2000
+
+
+def sales_series(shop, interval, start, end, group_by=None):
+    # Revenue and units per time bucket (optionally per product or category),
+    # grouped by the database in a single query over Sale(shop, created_at)
+    columns = GROUPS.get(group_by, {})
+
+    rows = (
+        Sale.objects.filter(shop=shop, created_at__gte=start, created_at__lt=end)
+        .annotate(bucket=Trunc("created_at", interval))
+        .values("bucket", *columns.values())
+        .annotate(revenue=Sum("total_price"), units=Sum("quantity_sold"))
+        .order_by("bucket", *columns.values())
+    )
+
+    return [
+        {
+            "bucket": row["bucket"],
+            **{name: row[column] for name, column in columns.items()},
+            "revenue": row["revenue"],
+            "units": row["units"],
+        }
+        for row in rows
+    ]
@@ -1,19 +1,51 @@
-
 from ..models import AuditLog
-from django.contrib.auth import get_user_model
+from django.conf import settings
+from django.db import transaction
 from ipware import get_client_ip
+from .audit_sink import sink
 
-def log_action(request, action, model=None, object_id=None, details=None, user=None):
-    User = get_user_model()
+def build_log_entry(request, action, model=None, object_id=None, details=None, user=None, shop=None):
     # Use provided user if given, otherwise fall back to request.user
     log_user = user if user is not None else (request.user if request.user.is_authenticated else None)
     ip, _ = get_client_ip(request)
-    
-    AuditLog.objects.create(
+
+    return AuditLog(
         user=log_user,
+        shop=shop,
         action=action,
         model=model,
         object_id=object_id,
         details=details or {},
         ip_address=ip
-    )
\ No newline at end of file
+    )
+
+
+def log_action(request, action, model=None, object_id=None, details=None, user=None, shop=None):
+    log_actions([build_log_entry(request, action, model, object_id, details, user, shop)])
+
+
+def log_actions(entries):
+    if not entries:
+        return
+
+    if not getattr(settings, 'AUDIT_LOG_ASYNC', True):
+        AuditLog.objects.bulk_create(entries)
+        return
+
+    # Hand the entries to the background writer once the surrounding
+    # transaction (if any) commits, so rolled back work is never audited
+    def enqueue():
+        for entry in entries:
+            sink.put(entry)
+
+    transaction.on_commit(enqueue)
+
+
+async def alog_action(request, action, model=None, object_id=None, details=None, user=None, shop=None):
+    # For async views. Queued entries need no database work here; outside a
+    # transaction on_commit runs them at once, so the sink gets them directly.
+    entry = build_log_entry(request, action, model, object_id, details, user, shop)
+    if getattr(settings, 'AUDIT_LOG_ASYNC', True):
+        sink.put(entry)
+    else:
+        await AuditLog.objects.abulk_create([entry])
@@ -0,0 +1,217 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, close_old_connections, transaction
+from django.utils.dateparse import parse_datetime
+from ..models import AuditLog
+
+logger = logging.getLogger(__name__)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _to_record(entry):
+    return {
+        'user_id': entry.user_id,
+        'shop_id': entry.shop_id,
+        'action': entry.action,
+        'model': entry.model,
+        'object_id': entry.object_id,
+        'details': entry.details,
+        'ip_address': entry.ip_address,
+        'timestamp': entry.timestamp.isoformat(),
+    }
+
+
+def _from_record(record):
+    record = dict(record)
+    record['timestamp'] = parse_datetime(record['timestamp'])
+    return AuditLog(**record)
+
+
+class AuditSink:
+    # Buffers AuditLog entries in memory and writes them from a background
+    # thread with bulk_create, once BATCH_SIZE entries are queued or
+    # FLUSH_INTERVAL seconds have passed. Batches that cannot be written are
+    # appended to an NDJSON spill file and replayed on the next good flush.
+
+    def __init__(self):
+        self.queue = queue.Queue(maxsize=_setting('AUDIT_LOG_QUEUE_SIZE', 100_000))
+        self.lock = threading.Lock()
+        self.spill_lock = threading.Lock()
+        self.stopping = threading.Event()
+        self.thread = None
+        self.pid = None
+
+    @property
+    def batch_size(self):
+        return _setting('AUDIT_LOG_BATCH_SIZE', 200)
+
+    @property
+    def flush_interval(self):
+        return _setting('AUDIT_LOG_FLUSH_INTERVAL', 2.0)
+
+    @property
+    def spill_path(self):
+        return str(_setting('AUDIT_LOG_SPILL_PATH', 'audit_spill.ndjson'))
+
+    @property
+    def quarantine_path(self):
+        return str(_setting('AUDIT_LOG_QUARANTINE_PATH', 'audit_quarantine.ndjson'))
+
+    def put(self, entry):
+        self.ensure_started()
+        try:
+            self.queue.put_nowait(entry)
+        except queue.Full:
+            # Never block a request on audit I/O; park the entry on disk instead
+            self.spill([entry])
+
+    def ensure_started(self):
+        # Started lazily so that each forked gunicorn worker gets its own writer
+        if self.thread is not None and self.pid == os.getpid() and self.thread.is_alive():
+            return
+        with self.lock:
+            if self.thread is not None and self.pid == os.getpid() and self.thread.is_alive():
+                return
+            self.pid = os.getpid()
+            self.stopping.clear()
+            self.thread = threading.Thread(target=self.run, name='audit-log-writer', daemon=True)
+            self.thread.start()
+
+    def run(self):
+        while not self.stopping.is_set():
+            batch = self.collect()
+            if batch:
+                try:
+                    self.flush(batch)
+                except Exception:
+                    # Keep the writer alive; losing it would silently fill the queue
+                    logger.exception("Audit log writer failed on %d entries", len(batch))
+
+    def collect(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+            if self.stopping.is_set():
+                break
+        return batch
+
+    def drain(self):
+        batch = []
+        while True:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                return batch
+
+    def flush(self, batch):
+        close_old_connections()
+        try:
+            unwritten = self.write(batch)
+        finally:
+            close_old_connections()
+        if unwritten:
+            self.spill(unwritten)
+        else:
+            self.replay_spill()
+
+    def write(self, entries):
+        # Returns the entries to retry later because the database could not
+        # be reached. Entries the database rejects (IntegrityError) would
+        # fail the same way forever, so they are quarantined instead.
+        try:
+            with transaction.atomic():
+                AuditLog.objects.bulk_create(entries, batch_size=self.batch_size)
+            return []
+        except IntegrityError:
+            logger.warning("Audit log batch of %d rejected, writing entries one by one", len(entries))
+        except DatabaseError:
+            logger.exception("Could not write %d audit log entries, spilling to disk", len(entries))
+            return entries
+
+        rejected = []
+        for i, entry in enumerate(entries):
+            try:
+                with transaction.atomic():
+                    AuditLog.objects.bulk_create([entry])
+            except IntegrityError:
+                rejected.append(entry)
+            except DatabaseError:
+                logger.exception("Could not write %d audit log entries, spilling to disk", len(entries) - i)
+                self.quarantine(rejected)
+                return entries[i:]
+        self.quarantine(rejected)
+        return []
+
+    def append(self, path, entries):
+        with self.spill_lock:
+            with open(path, 'a', encoding='utf-8') as f:
+                for entry in entries:
+                    f.write(json.dumps(_to_record(entry), default=str) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+
+    def spill(self, entries):
+        self.append(self.spill_path, entries)
+
+    def quarantine(self, entries):
+        if entries:
+            logger.error("Quarantining %d audit log entries the database rejected in %s",
+                         len(entries), self.quarantine_path)
+            self.append(self.quarantine_path, entries)
+
+    def replay_spill(self):
+        path = self.spill_path
+        if not os.path.exists(path):
+            return
+
+        with self.spill_lock:
+            replaying = f"{path}.{os.getpid()}.replay"
+            try:
+                os.replace(path, replaying)
+            except FileNotFoundError:
+                return
+
+        entries = []
+        with open(replaying, encoding='utf-8') as f:
+            for number, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    entries.append(_from_record(json.loads(line)))
+                except (ValueError, TypeError, KeyError):
+                    # e.g. a line torn by a crash mid-write
+                    logger.error("Skipping unreadable line %d of spilled audit log: %r", number, line[:200])
+
+        unwritten = self.write(entries)
+        if unwritten:
+            self.spill(unwritten)
+        os.remove(replaying)
+
+    def shutdown(self):
+        # Flush whatever is still queued; called at interpreter exit
+        self.stopping.set()
+        if self.thread is not None and self.pid == os.getpid():
+            self.thread.join(timeout=self.flush_interval + 1)
+        batch = self.drain()
+        if batch:
+            self.flush(batch)
+
+
+sink = AuditSink()
+atexit.register(sink.shutdown)
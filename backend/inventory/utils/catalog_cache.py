@@ -0,0 +1,66 @@
+import hashlib
+from django.conf import settings
+from django.core.cache import caches
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils.http import parse_etags
+from ..models import CatalogVersion
+
+# Per-shop cache of the rendered product catalog. Every shop has a version
+# number; cached payloads and ETags embed it, so invalidating a shop is a
+# single UPDATE and stale entries simply stop being read (and expire).
+# Versions are CatalogVersion rows: the increment is atomic, so concurrent
+# bumps from any worker, host or import_products each give a new number.
+# Payloads never change under a version, so CATALOG_CACHE_ALIAS may be local
+# memory.
+
+
+def _cache():
+    return caches[getattr(settings, 'CATALOG_CACHE_ALIAS', 'default')]
+
+
+def _timeout():
+    return getattr(settings, 'CATALOG_CACHE_TIMEOUT', 300)
+
+
+def get_version(shop_id):
+    # 0 until the shop's catalog first changes
+    return CatalogVersion.objects.filter(shop_id=shop_id).values_list('version', flat=True).first() or 0
+
+
+def invalidate(shop_id):
+    def bump():
+        versions = CatalogVersion.objects.filter(shop_id=shop_id)
+        if versions.update(version=F('version') + 1):
+            return
+        try:
+            with transaction.atomic():
+                CatalogVersion.objects.create(shop_id=shop_id, version=1)
+        except IntegrityError:
+            # A concurrent bump created the row first
+            versions.update(version=F('version') + 1)
+
+    # Only after the change is visible to other connections
+    transaction.on_commit(bump)
+
+
+def variant_key(*parts):
+    return hashlib.md5("|".join(str(p) for p in parts).encode()).hexdigest()[:12]
+
+
+def etag(shop_id, version, variant):
+    return f'"catalog-{shop_id}-{version}-{variant}"'
+
+
+def matches(request, etag):
+    # Weak comparison: compression middleware hands out W/"..." ETags
+    tags = parse_etags(request.headers.get('If-None-Match', ''))
+    return etag in tags or f"W/{etag}" in tags or "*" in tags
+
+
+def load(shop_id, version, variant):
+    return _cache().get(f"catalog:{shop_id}:{version}:{variant}")
+
+
+def store(shop_id, version, variant, payload):
+    _cache().set(f"catalog:{shop_id}:{version}:{variant}", payload, timeout=_timeout())
@@ -0,0 +1,105 @@
+from decimal import Decimal
+from django.db import transaction
+from ..models import Product, Sale
+from .audit_logger import build_log_entry, log_actions
+from . import catalog_cache, stock_alerts
+from .rollups import record_sales
+from .stock import reserve_many
+
+
+class CheckoutError(Exception):
+    status_code = 400
+
+
+class ProductNotFound(CheckoutError):
+    status_code = 404
+
+
+class InsufficientStock(CheckoutError):
+    pass
+
+
+def parse_lines(sales_data):
+    # Normalise the "sales" payload into (product_id, quantity) pairs
+    lines = []
+    for sale in sales_data:
+        product_id = sale.get("product_id")
+        quantity = sale.get("quantity")
+
+        if not product_id or not quantity:
+            raise CheckoutError("Product ID and quantity are required")
+
+        try:
+            product_id, quantity = int(product_id), int(quantity)
+        except (TypeError, ValueError):
+            raise CheckoutError("Product ID and quantity must be integers")
+
+        if quantity < 1:
+            raise CheckoutError("Quantity must be at least 1")
+
+        lines.append((product_id, quantity))
+    return lines
+
+
+# Record a whole basket in one transaction with a fixed number of queries:
+# read the products, decrement stock in one conditional UPDATE, then bulk
+# insert the sales and their audit entries.
+def checkout(request, shop, sales_data):
+    lines = parse_lines(sales_data)
+    user = request.user
+
+    # The same product may appear on several lines; stock is checked on the total
+    needed = {}
+    for product_id, quantity in lines:
+        needed[product_id] = needed.get(product_id, 0) + quantity
+
+    with transaction.atomic():
+        products = Product.objects.filter(shop=shop, id__in=needed).in_bulk()
+
+        missing = [pid for pid in needed if pid not in products]
+        if missing:
+            raise ProductNotFound(f"Product {missing[0]} not found")
+
+        for product_id, quantity in needed.items():
+            product = products[product_id]
+            if product.quantity < quantity:
+                raise InsufficientStock(f"Not enough stock for {product.name}")
+
+        # Guards against another till selling the same stock since the read above
+        if not reserve_many(needed):
+            raise InsufficientStock("Not enough stock")
+        stock_alerts.evaluate(needed)
+
+        sales = Sale.objects.bulk_create([
+            Sale(
+                shop=shop,
+                product=products[product_id],
+                quantity_sold=quantity,
+                total_price=Decimal(quantity) * products[product_id].price,
+            )
+            for product_id, quantity in lines
+        ])
+
+        record_sales(sales)
+        catalog_cache.invalidate(shop.id)
+
+        log_actions([
+            build_log_entry(
+                request,
+                action='SALE',
+                user=user,
+                shop=shop,
+                model='Sale',
+                object_id=str(sale.id),
+                details={
+                    'description': f"{user.username} sold {sale.quantity_sold} of {sale.product.name} for {shop.name}",
+                    'product_name': sale.product.name,
+                    'quantity': sale.quantity_sold,
+                    'total_price': str(sale.total_price),
+                    'shop': shop.name
+                }
+            )
+            for sale in sales
+        ])
+
+    return sales
@@ -0,0 +1,84 @@
+import csv
+import json
+import zlib
+from datetime import datetime
+from django.core.serializers.json import DjangoJSONEncoder
+
+# Row streaming for bulk exports. Rows are pulled from the database with
+# iterator(chunk_size=...) (a server-side cursor on PostgreSQL) and encoded
+# chunk by chunk, so memory stays flat however many rows are exported.
+
+CHUNK_SIZE = 2000
+
+AUDIT_LOG_FIELDS = [
+    'id', 'timestamp', 'user_id', 'user__username', 'shop_id', 'action',
+    'model', 'object_id', 'details', 'ip_address',
+]
+
+SALE_FIELDS = [
+    'id', 'created_at', 'shop_id', 'product_id', 'product__name',
+    'quantity_sold', 'total_price',
+]
+
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+class _Echo:
+    # csv.writer wants a file; this one hands the formatted line straight back
+    def write(self, value):
+        return value
+
+
+def _batched(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def ndjson_chunks(rows, fields, chunk_size=CHUNK_SIZE):
+    encoder = DjangoJSONEncoder()
+    for batch in _batched(rows, chunk_size):
+        yield "".join(encoder.encode(row) + "\n" for row in batch).encode()
+
+
+def csv_chunks(rows, fields, chunk_size=CHUNK_SIZE):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(fields).encode()
+    for batch in _batched(rows, chunk_size):
+        lines = []
+        for row in batch:
+            values = []
+            for field in fields:
+                value = row[field]
+                if isinstance(value, (dict, list)):
+                    value = json.dumps(value, cls=DjangoJSONEncoder)
+                elif isinstance(value, datetime):
+                    value = value.isoformat()
+                values.append(value)
+            lines.append(writer.writerow(values))
+        yield "".join(lines).encode()
+
+
+def gzip_chunks(chunks, level=6):
+    # wbits=31 writes a gzip header and trailer around the deflate stream
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_chunks(queryset, fields, fmt='ndjson', compress=False, chunk_size=CHUNK_SIZE):
+    rows = queryset.order_by('id').values(*fields).iterator(chunk_size=chunk_size)
+    encode = csv_chunks if fmt == 'csv' else ndjson_chunks
+    chunks = encode(rows, fields, chunk_size)
+    return gzip_chunks(chunks) if compress else chunks
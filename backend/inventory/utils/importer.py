@@ -0,0 +1,208 @@
+import csv
+import glob
+import os
+import zipfile
+import zlib
+from decimal import Decimal, InvalidOperation
+from xml.etree.ElementTree import ParseError
+from django.db import transaction
+from django.utils import timezone
+from ..models import Product
+from . import stock_alerts
+
+# Streaming product import: rows are read lazily (openpyxl read-only mode
+# for workbooks), validated, and written in chunks with one transaction,
+# one SELECT, one bulk_update and one bulk_create per chunk. Products are
+# matched on (shop, name); existing ones get the sheet's quantity and price.
+
+FIELDS = ("name", "quantity", "price")
+EXTENSIONS = (".csv", ".xlsx", ".xlsm")
+# Column order of the supplier sheets the original importer was written for
+LEGACY_COLUMNS = ("quantity", "name", "price")
+# What reading a bad file can raise: unreadable files, and corrupt or
+# truncated workbooks (an .xlsx is a zip archive of XML parts)
+READ_ERRORS = (ValueError, OSError, zipfile.BadZipFile, zlib.error, ParseError)
+
+
+class RowError(ValueError):
+    pass
+
+
+def open_rows(path):
+    # Returns (header, rows) where rows is a lazy iterator over the data rows
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".csv":
+        f = open(path, newline="", encoding="utf-8-sig")
+        reader = csv.reader(f)
+        header = next(reader, [])
+
+        def rows():
+            with f:
+                yield from reader
+        return header, rows()
+
+    if ext in (".xlsx", ".xlsm"):
+        import openpyxl
+        from openpyxl.utils.exceptions import InvalidFileException
+
+        try:
+            wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        except (zipfile.BadZipFile, InvalidFileException, KeyError) as e:
+            raise ValueError(f"Not a readable workbook: {e}")
+        rows = wb.active.iter_rows(values_only=True)
+        header = next(rows, ())
+
+        def close_after():
+            try:
+                yield from rows
+            finally:
+                wb.close()
+        return list(header), close_after()
+
+    raise ValueError(f"Unsupported file type: {path} (expected .csv or .xlsx)")
+
+
+def parse_columns(spec):
+    # "name=Product Name,quantity=Qty" -> {"name": "Product Name", "quantity": "Qty"}
+    columns = {}
+    for part in filter(None, (spec or "").split(",")):
+        field, _, column = part.partition("=")
+        field = field.strip().lower()
+        if field not in FIELDS or not column.strip():
+            raise ValueError(f"Bad column mapping {part!r}; use field=Header with field one of {', '.join(FIELDS)}")
+        columns[field] = column.strip()
+    return columns
+
+
+def map_columns(header, columns=None):
+    # Resolve each field to a column index: explicit mapping first, then a
+    # header cell named like the field, then the legacy positional layout
+    names = [str(cell).strip().lower() if cell is not None else "" for cell in header]
+    indexes = {}
+    for field in FIELDS:
+        wanted = (columns or {}).get(field, field).lower()
+        if wanted in names:
+            indexes[field] = names.index(wanted)
+        elif columns and field in columns:
+            raise ValueError(f"Column {columns[field]!r} for {field} not found in header")
+
+    if len(indexes) < len(FIELDS):
+        indexes = {field: LEGACY_COLUMNS.index(field) for field in FIELDS}
+    return indexes
+
+
+def parse_row(row, indexes):
+    def cell(field):
+        i = indexes[field]
+        return row[i] if i < len(row) else None
+
+    name = cell("name")
+    name = str(name).strip() if name is not None else ""
+    if not name:
+        raise RowError("missing name")
+    if len(name) > 255:
+        raise RowError("name longer than 255 characters")
+
+    try:
+        quantity = Decimal(str(cell("quantity")).strip())
+        if quantity != quantity.to_integral_value() or quantity < 0:
+            raise InvalidOperation
+        quantity = int(quantity)
+    except (InvalidOperation, ValueError):
+        raise RowError(f"bad quantity {cell('quantity')!r}")
+
+    try:
+        price = Decimal(str(cell("price")).strip()).quantize(Decimal("0.01"))
+        if price < 0 or price >= Decimal("1e8"):
+            raise InvalidOperation
+    except (InvalidOperation, ValueError):
+        raise RowError(f"bad price {cell('price')!r}")
+
+    return name, quantity, price
+
+
+def is_blank(row):
+    return all(value is None or str(value).strip() == "" for value in row)
+
+
+def parse_file(path, columns=None):
+    # Yields ("row", line, (name, quantity, price)) or ("error", line, message)
+    header, rows = open_rows(path)
+    indexes = map_columns(header, columns)
+    for line, row in enumerate(rows, start=2):
+        if is_blank(row):
+            continue
+        try:
+            yield "row", line, parse_row(row, indexes)
+        except RowError as e:
+            yield "error", line, str(e)
+
+
+def read_chunks(path, columns=None, size=5000):
+    # Yields (rows, errors) pairs holding at most `size` lines between them,
+    # so memory stays flat however large the file. A file that cannot be
+    # read ends with a (None, message) error.
+    rows, errors = [], []
+    try:
+        for kind, line, value in parse_file(path, columns):
+            if kind == "row":
+                rows.append(value)
+            else:
+                errors.append((line, value))
+            if len(rows) + len(errors) >= size:
+                yield rows, errors
+                rows, errors = [], []
+    except READ_ERRORS as e:
+        errors.append((None, str(e)))
+    if rows or errors:
+        yield rows, errors
+
+
+def load_file(path, out, columns=None, size=5000):
+    # Runs in import worker processes: parse and validate one file, touching
+    # no database, and hand its chunks to the importing process through the
+    # bounded queue `out`, followed by None
+    try:
+        for chunk in read_chunks(path, columns, size):
+            out.put(chunk)
+    finally:
+        out.put(None)
+
+
+def expand_paths(patterns):
+    # Each pattern may be a file, a directory (its .csv/.xlsx files) or a glob
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = [os.path.join(pattern, name) for name in os.listdir(pattern)]
+        else:
+            matches = glob.glob(pattern) or [pattern]
+        paths.extend(sorted(p for p in matches if p == pattern or p.lower().endswith(EXTENSIONS)))
+    return list(dict.fromkeys(paths))
+
+
+def upsert_chunk(shop, rows, category=None):
+    # rows: [(name, quantity, price)]. Later rows win when a name repeats.
+    latest = {}
+    for name, quantity, price in rows:
+        latest[name] = (quantity, price)
+
+    now = timezone.now()
+    with transaction.atomic():
+        existing = {p.name: p for p in Product.objects.filter(shop=shop, name__in=list(latest))}
+
+        to_update, to_create = [], []
+        for name, (quantity, price) in latest.items():
+            product = existing.get(name)
+            if product is None:
+                to_create.append(Product(shop=shop, category=category, name=name, quantity=quantity, price=price))
+            elif product.quantity != quantity or product.price != price:
+                product.quantity, product.price, product.updated_at = quantity, price, now
+                to_update.append(product)
+
+        Product.objects.bulk_update(to_update, ["quantity", "price", "updated_at"], batch_size=1000)
+        Product.objects.bulk_create(to_create, batch_size=1000)
+        # New products have no alerts yet
+        stock_alerts.evaluate(p.pk for p in to_update)
+
+    return len(to_create), len(to_update), [p.pk for p in to_update + to_create]
@@ -0,0 +1,210 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.utils.module_loading import import_string
+from ..renderers import dumps
+
+try:
+    import redis
+except ImportError:  # only needed for RedisBroker
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+# Live per-shop events for the /api/live/ server-sent-events stream. Views
+# publish once their transaction commits and every client connected for the
+# shop receives the event. LIVE_EVENTS_BROKER picks the fan-out: LocalBroker
+# (the default) reaches the clients of this process only; RedisBroker (used
+# when REDIS_URL is set) reaches every worker through Redis pub/sub.
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class Subscription:
+    # One connected client. Events are pushed from whichever thread commits
+    # and read by the client's stream on the event loop (`loop`). A
+    # client too slow to keep LIVE_EVENTS_QUEUE_SIZE events is told to resync
+    # instead of holding an ever-growing backlog.
+
+    def __init__(self, shop_id, loop=None):
+        self.shop_id = shop_id
+        self.events = deque()
+        self.lock = threading.Lock()
+        self.overflowed = False
+        self.loop = loop
+        self.ready = asyncio.Event() if loop else threading.Event()
+
+    def put(self, event):
+        with self.lock:
+            if len(self.events) >= _setting('LIVE_EVENTS_QUEUE_SIZE', 100):
+                self.events.clear()
+                self.overflowed = True
+            else:
+                self.events.append(event)
+        if self.loop is None:
+            self.ready.set()
+            return
+        try:
+            self.loop.call_soon_threadsafe(self.ready.set)
+        except RuntimeError:
+            pass  # the loop has closed; the client is gone
+
+    def drain(self):
+        with self.lock:
+            events = list(self.events)
+            self.events.clear()
+            if self.overflowed:
+                events.append({"type": "resync", "data": {}})
+                self.overflowed = False
+            self.ready.clear()
+        return events
+
+    async def await_events(self, timeout):
+        try:
+            await asyncio.wait_for(self.ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self.drain()
+
+
+class LocalBroker:
+    # In-process fan-out: enough for a single worker process. Backends that
+    # fan out between processes override publish() and call deliver() for
+    # every event they receive.
+
+    def __init__(self):
+        self.subscriptions = defaultdict(set)
+        self.lock = threading.Lock()
+
+    def subscribe(self, shop_id, loop=None):
+        subscription = Subscription(shop_id, loop)
+        with self.lock:
+            self.subscriptions[shop_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            subscriptions = self.subscriptions.get(subscription.shop_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self.subscriptions[subscription.shop_id]
+
+    def listening(self, shop_id):
+        # Whether an event for the shop could reach anyone, so publishers can
+        # skip the queries that build it
+        return shop_id in self.subscriptions
+
+    def publish(self, shop_id, event):
+        self.deliver(shop_id, event)
+
+    def deliver(self, shop_id, event):
+        with self.lock:
+            subscriptions = list(self.subscriptions.get(shop_id, ()))
+        for subscription in subscriptions:
+            subscription.put(event)
+
+
+class RedisBroker(LocalBroker):
+    # Fan-out between worker processes over Redis pub/sub (LIVE_EVENTS_REDIS_URL).
+    # One channel per shop; a background thread listens on the channels of
+    # the shops that have clients in this process.
+
+    def __init__(self):
+        super().__init__()
+        if redis is None:
+            raise ImproperlyConfigured("RedisBroker needs the redis package")
+        self.client = redis.Redis.from_url(_setting('LIVE_EVENTS_REDIS_URL', None) or 'redis://localhost:6379/0')
+        self.pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        self.thread = None
+
+    def channel(self, shop_id):
+        return f"inventory:live:{shop_id}"
+
+    def subscribe(self, shop_id, loop=None):
+        subscription = super().subscribe(shop_id, loop)
+        self.pubsub.subscribe(**{self.channel(shop_id): self.received})
+        with self.lock:
+            if self.thread is None:
+                self.thread = self.pubsub.run_in_thread(sleep_time=1.0, daemon=True)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        super().unsubscribe(subscription)
+        if not super().listening(subscription.shop_id):
+            self.pubsub.unsubscribe(self.channel(subscription.shop_id))
+
+    def listening(self, shop_id):
+        # Clients of other processes are invisible from here
+        return True
+
+    def publish(self, shop_id, event):
+        try:
+            self.client.publish(self.channel(shop_id), dumps(event))
+        except redis.RedisError:
+            logger.exception("Could not publish live event for shop %s", shop_id)
+
+    def received(self, message):
+        shop_id = int(message["channel"].rsplit(b":", 1)[1])
+        self.deliver(shop_id, json.loads(message["data"]))
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = import_string(_setting('LIVE_EVENTS_BROKER', 'inventory.utils.live.LocalBroker'))()
+    return _broker
+
+
+def publish(shop_id, kind, build):
+    # Once the current transaction commits, send a `kind` event whose data is
+    # build()'s return value. build runs only if the shop has listeners.
+    def send():
+        try:
+            broker = get_broker()
+            if broker.listening(shop_id):
+                broker.publish(shop_id, {"type": kind, "data": build()})
+        except Exception:
+            # The change itself is committed (and outside a transaction this
+            # runs inside the request), so never fail it: a lost event only
+            # means clients see the change on their next resync
+            logger.exception("Could not publish live %s event for shop %s", kind, shop_id)
+
+    transaction.on_commit(send)
+
+
+def format_event(event):
+    return f"event: {event['type']}\ndata: {dumps(event['data']).decode()}\n\n".encode()
+
+
+# Sent every LIVE_STREAM_HEARTBEAT seconds so proxies keep idle streams open
+HEARTBEAT = b": keep-alive\n\n"
+
+
+async def astream(shop_id):
+    # The event stream of one client. Runs on the ASGI event loop, so an idle
+    # client holds no thread.
+    broker = get_broker()
+    subscription = broker.subscribe(shop_id, loop=asyncio.get_running_loop())
+    deadline = time.monotonic() + _setting('LIVE_STREAM_MAX_AGE', 300)
+    try:
+        yield b"retry: 3000\n\n"
+        while time.monotonic() < deadline:
+            events = await subscription.await_events(_setting('LIVE_STREAM_HEARTBEAT', 15))
+            yield b"".join(map(format_event, events)) or HEARTBEAT
+    finally:
+        broker.unsubscribe(subscription)
@@ -0,0 +1,57 @@
+import math
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+from ..models import DailySalesRollup, Product, ReplenishmentSuggestion
+
+# Sales velocity per product over a rolling window, read per shop as two
+# column sets (units sold per product from the daily rollup, and stock on
+# hand) and combined in one pass, so the cost is two SELECTs and a bulk
+# insert per shop regardless of catalog size.
+
+WINDOW_DAYS = 28
+LEAD_TIME_DAYS = 7
+COVER_DAYS = 14
+
+
+def compute(shop, window_days=WINDOW_DAYS, lead_time_days=LEAD_TIME_DAYS, cover_days=COVER_DAYS, today=None):
+    # Reorder enough to last lead time + cover days at the current velocity.
+    # Products younger than the window are averaged over the days they existed.
+    today = today or timezone.localdate()
+    start = today - timedelta(days=window_days - 1)
+    computed_at = timezone.now()
+
+    units = dict(
+        DailySalesRollup.objects.filter(shop=shop, date__gte=start, date__lte=today, product__isnull=False)
+        .values_list("product_id")
+        .annotate(units=Sum("quantity"))
+        .order_by()
+    )
+
+    suggestions = []
+    for product_id, quantity, created_at in Product.objects.filter(shop=shop).values_list("id", "quantity", "created_at"):
+        age = (today - timezone.localdate(created_at)).days + 1
+        velocity = units.get(product_id, 0) / max(1, min(window_days, age))
+        suggestions.append(ReplenishmentSuggestion(
+            shop=shop,
+            product_id=product_id,
+            avg_daily_units=round(velocity, 3),
+            days_of_cover=round(quantity / velocity, 1) if velocity else None,
+            reorder_quantity=max(0, math.ceil(velocity * (lead_time_days + cover_days)) - quantity),
+            computed_at=computed_at,
+        ))
+
+    with transaction.atomic():
+        ReplenishmentSuggestion.objects.filter(shop=shop).delete()
+        ReplenishmentSuggestion.objects.bulk_create(suggestions, batch_size=5000)
+    return len(suggestions)
+
+
+def suggestions(shop):
+    # Products that need reordering, the ones running out soonest first
+    return (
+        ReplenishmentSuggestion.objects.filter(shop=shop, reorder_quantity__gt=0)
+        .select_related("product")
+        .order_by("days_of_cover", "product_id")
+    )
@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.core.cache import caches
+
+# A user's role names (their auth group names, ordered by group id), loaded
+# with one query and then remembered on the user object for the rest of the
+# request and in the cache across requests. signals.py drops the cached
+# entry whenever the user's groups change.
+
+MANAGER = 'Manager'
+STOCK_CLERK = 'Stock Clerk'
+SALES_PERSON = 'Sales Person'
+
+
+def _cache():
+    return caches[getattr(settings, 'ROLE_CACHE_ALIAS', 'default')]
+
+
+def _key(user_id):
+    return f"roles:{user_id}"
+
+
+def user_roles(user):
+    if not user or not user.is_authenticated:
+        return ()
+
+    roles = getattr(user, '_inventory_roles', None)
+    if roles is None:
+        roles = _cache().get(_key(user.pk))
+        if roles is None:
+            roles = tuple(user.groups.order_by('id').values_list('name', flat=True))
+            _cache().set(_key(user.pk), roles, timeout=getattr(settings, 'ROLE_CACHE_TIMEOUT', 300))
+        user._inventory_roles = roles
+    return roles
+
+
+def has_role(user, role):
+    return role in user_roles(user)
+
+
+def invalidate(*user_ids):
+    _cache().delete_many([_key(user_id) for user_id in user_ids])
@@ -0,0 +1,99 @@
+from datetime import timedelta
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, PositiveIntegerField, Q, Sum, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from ..models import DailySalesRollup, Sale
+
+
+def record_sales(sales):
+    # Fold newly created sales into their (shop, date, product) rollup rows.
+    # Missing rows are inserted empty first, then every row is incremented
+    # in one UPDATE, so concurrent tills add up instead of overwriting.
+    totals = {}
+    for sale in sales:
+        if sale.product_id is None:
+            continue
+        key = (sale.shop_id, timezone.localdate(sale.created_at), sale.product_id)
+        quantity, revenue = totals.get(key, (0, Decimal("0")))
+        totals[key] = (quantity + sale.quantity_sold, revenue + sale.total_price)
+
+    if not totals:
+        return
+
+    DailySalesRollup.objects.bulk_create(
+        [DailySalesRollup(shop_id=shop_id, date=date, product_id=product_id)
+         for shop_id, date, product_id in totals],
+        ignore_conflicts=True,
+    )
+
+    condition = Q()
+    quantity_cases, revenue_cases = [], []
+    for (shop_id, date, product_id), (quantity, revenue) in totals.items():
+        key = Q(shop_id=shop_id, date=date, product_id=product_id)
+        condition |= key
+        quantity_cases.append(When(key, then=F("quantity") + quantity))
+        revenue_cases.append(When(key, then=F("revenue") + revenue))
+
+    DailySalesRollup.objects.filter(condition).update(
+        quantity=Case(*quantity_cases, default=F("quantity"), output_field=PositiveIntegerField()),
+        revenue=Case(*revenue_cases, default=F("revenue"), output_field=DecimalField(max_digits=14, decimal_places=2)),
+    )
+
+
+def rebuild(shop=None):
+    # Recompute the rollup from the Sale table, e.g. after backfilling history
+    # or deleting sales through the admin
+    sales = Sale.objects.all()
+    rollups = DailySalesRollup.objects.all()
+    if shop is not None:
+        sales = sales.filter(shop=shop)
+        rollups = rollups.filter(shop=shop)
+
+    rows = (
+        sales.annotate(date=TruncDate("created_at"))
+        .values("shop_id", "date", "product_id")
+        .annotate(quantity=Sum("quantity_sold"), revenue=Sum("total_price"))
+        .order_by()
+    )
+
+    with transaction.atomic():
+        rollups.delete()
+        created = DailySalesRollup.objects.bulk_create(
+            (DailySalesRollup(**row) for row in rows.iterator(chunk_size=5000)),
+            batch_size=5000,
+        )
+    return len(created)
+
+
+def _totals_query(shop, today):
+    today = today or timezone.localdate()
+    week_start = today - timedelta(days=today.weekday())
+    month_start = today.replace(day=1)
+
+    rows = DailySalesRollup.objects.filter(shop=shop, date__gte=min(week_start, month_start), date__lte=today)
+    return rows, {
+        "daily": Sum("revenue", filter=Q(date=today)),
+        "weekly": Sum("revenue", filter=Q(date__gte=week_start)),
+        "monthly": Sum("revenue", filter=Q(date__gte=month_start)),
+    }
+
+
+def _totals_result(totals):
+    return {
+        "daily_sales": totals["daily"] or 0,
+        "weekly_sales": totals["weekly"] or 0,
+        "monthly_sales": totals["monthly"] or 0,
+    }
+
+
+def sales_totals(shop, today=None):
+    # Day, week and month revenue for a shop from its rollup rows, in one query
+    rows, aggregates = _totals_query(shop, today)
+    return _totals_result(rows.aggregate(**aggregates))
+
+
+async def asales_totals(shop, today=None):
+    rows, aggregates = _totals_query(shop, today)
+    return _totals_result(await rows.aaggregate(**aggregates))
@@ -0,0 +1,43 @@
+from django.http import Http404
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from ..models import Shop
+
+# The shops a user owns are loaded once (and kept with the user in the token
+# cache); ShopMiddleware then exposes the one a request acts on as
+# request.shop. Owners of several shops pick one with the X-Shop-Id header
+# (or ?shop_id= where headers cannot be set).
+
+
+class ShopSelectionRequired(APIException):
+    status_code = status.HTTP_400_BAD_REQUEST
+    default_detail = "You own several shops; choose one with the X-Shop-Id header."
+    default_code = "shop_selection_required"
+
+
+def owned_shops(user):
+    if not user or not user.is_authenticated:
+        return ()
+
+    shops = getattr(user, '_inventory_shops', None)
+    if shops is None:
+        shops = tuple(Shop.objects.filter(owner=user).order_by('id'))
+        user._inventory_shops = shops
+    return shops
+
+
+def resolve_shop(request):
+    shops = owned_shops(request.user)
+
+    requested = request.headers.get('X-Shop-Id') or request.GET.get('shop_id')
+    if requested:
+        for shop in shops:
+            if str(shop.id) == requested:
+                return shop
+        raise Http404("No such shop for the logged-in user")
+
+    if not shops:
+        raise Http404("No shop found for the logged-in user")
+    if len(shops) > 1:
+        raise ShopSelectionRequired()
+    return shops[0]
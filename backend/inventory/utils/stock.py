@@ -0,0 +1,38 @@
+from django.db.models import Case, F, PositiveIntegerField, Q, When
+from django.utils import timezone
+from ..models import Product
+
+# Stock is only ever changed with single-statement conditional UPDATEs
+# (quantity = quantity - n WHERE quantity >= n), so concurrent tills can
+# never read a stale quantity and oversell; the matched row count tells the
+# caller whether the reservation went through.
+
+
+def reserve_stock(product_id, quantity):
+    updated = Product.objects.filter(pk=product_id, quantity__gte=quantity).update(
+        quantity=F("quantity") - quantity,
+        updated_at=timezone.now(),
+    )
+    return updated == 1
+
+
+def reserve_many(needed):
+    # needed maps product id -> quantity. Returns True only if every product
+    # had enough stock; callers must run this inside a transaction and roll
+    # back on False, since the rows that did match have been decremented.
+    if not needed:
+        return True
+
+    condition = Q()
+    for product_id, quantity in needed.items():
+        condition |= Q(pk=product_id, quantity__gte=quantity)
+
+    updated = Product.objects.filter(condition).update(
+        quantity=Case(
+            *[When(pk=pid, then=F("quantity") - qty) for pid, qty in needed.items()],
+            default=F("quantity"),
+            output_field=PositiveIntegerField(),
+        ),
+        updated_at=timezone.now(),
+    )
+    return updated == len(needed)
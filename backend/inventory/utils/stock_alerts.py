@@ -0,0 +1,29 @@
+from django.db.models import F
+from ..models import StockAlert
+
+# Low-stock alerts are evaluated only for the products a write touched: two
+# bulk UPDATEs flip is_alerted on the alerts whose state actually changed,
+# so nothing ever scans the whole catalog. Alerted rows are served from the
+# partial index on (shop) WHERE is_alerted.
+
+
+def evaluate(product_ids):
+    product_ids = list(product_ids)
+    if not product_ids:
+        return
+    alerts = StockAlert.objects.filter(product_id__in=product_ids)
+    alerts.filter(is_alerted=False, product__quantity__lte=F("threshold")).update(is_alerted=True)
+    alerts.filter(is_alerted=True, product__quantity__gt=F("threshold")).update(is_alerted=False)
+
+
+def move_to_shop(product):
+    # Alerts follow their product when it is moved to another shop
+    StockAlert.objects.filter(product=product).exclude(shop_id=product.shop_id).update(shop_id=product.shop_id)
+
+
+def alerted(shop):
+    return (
+        StockAlert.objects.filter(shop=shop, is_alerted=True)
+        .select_related("product")
+        .order_by("product__quantity", "product_id")
+    )
@@ -0,0 +1,59 @@
+import base64
+from datetime import timedelta
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ValidationError
+from ..models import Product, ProductTombstone
+
+# Incremental product sync. A cursor is the server time the previous sync
+# started at, minus a small overlap: updated_at is stamped before commit, so
+# a write that commits just after a sync reads could otherwise carry a
+# timestamp the client has already moved past. Clients treat "changed" as
+# upserts, so seeing a row twice is harmless.
+
+OVERLAP = timedelta(seconds=5)
+# Cursors older than this get a full resync, so older tombstones are deleted
+# (by record_deletion, whenever the shop loses another product)
+TOMBSTONE_RETENTION = timedelta(days=30)
+
+
+def encode_cursor(value):
+    return base64.urlsafe_b64encode(value.isoformat().encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        value = parse_datetime(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode())
+    except (ValueError, UnicodeDecodeError):
+        value = None
+    if value is None:
+        raise ValidationError({"since": "Invalid cursor"})
+    return value
+
+
+def changes_since(shop, since=None):
+    started = timezone.now()
+    products = Product.objects.filter(shop=shop).select_related("category", "shop").order_by("id")
+    deleted = []
+
+    full = since is None or since < started - TOMBSTONE_RETENTION
+    if not full:
+        products = products.filter(updated_at__gte=since)
+        deleted = list(
+            ProductTombstone.objects.filter(shop=shop, deleted_at__gte=since)
+            .values_list("product_id", flat=True).distinct()
+        )
+
+    return {
+        "products": products,
+        "deleted": deleted,
+        "full": full,
+        "cursor": encode_cursor(started - OVERLAP),
+    }
+
+
+def record_deletion(product, shop_id=None):
+    shop_id = shop_id or product.shop_id
+    ProductTombstone.objects.filter(shop_id=shop_id, deleted_at__lt=timezone.now() - TOMBSTONE_RETENTION).delete()
+    ProductTombstone.objects.create(shop_id=shop_id, product_id=product.pk)
+
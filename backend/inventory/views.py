@@ -1,48 +1,201 @@
 from django.shortcuts import render
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
 from rest_framework.response import Response
 from rest_framework import status
 from django.shortcuts import get_object_or_404
 from .models import Product, Sale, Category, Shop, AuditLog
-from .serializers import ProductSerializer, SaleSerializer, CategorySerializer, ProductViewSerializer, AuditLogSerializer
-from django.db.models import Sum
-from django.utils.timezone import now, timedelta
+from .serializers import ProductSerializer, SaleSerializer, CategorySerializer
+from .serializers import product_values, product_dicts, audit_log_values, audit_log_dicts
+from django.utils.timezone import now
 from django.contrib.auth import authenticate
 from rest_framework.authtoken.models import Token
-from decimal import Decimal
 from rest_framework.permissions import IsAuthenticated
 from .permissions import IsManager, IsStockClerk, IsSalesPerson
+from .utils.roles import user_roles
+from .utils.shops import owned_shops, resolve_shop
+from .authentication import touch_token
 from .utils.audit_logger import log_action
+from .utils.checkout import checkout, CheckoutError
+from .utils.rollups import sales_totals
+from .utils.analytics import sales_series, INTERVALS, GROUPS, MAX_BUCKETS
+from .pagination import keyset_page, ProductPagination
+from .utils.export import export_chunks, AUDIT_LOG_FIELDS, SALE_FIELDS, FORMATS
+from django.http import Http404, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from . import renderers
+from .utils import catalog_cache, live, replenishment, stock_alerts
+from .utils.sync import changes_since, record_deletion, decode_cursor as decode_sync_cursor
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+from django.utils.dateparse import parse_datetime
+from django.utils.timezone import is_naive, make_aware
+from django.conf import settings
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.http import require_GET
+from .metrics import registry
 # Create your views here.
 
 
 
-# ✅ List all products 
+# ✅ List all products (?fields=id,name,... and ?page=&page_size= are optional)
+# Served from the per-shop catalog cache; If-None-Match with the current
+# ETag gets a 304 without touching the products at all.
+# async_views.listProducts is the same view for ASGI deployments.
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def listProducts(request):
-    user = request.user
-    shop = get_object_or_404(Shop, owner=user)
-    products = Product.objects.filter(shop=shop)
-    serializer = ProductViewSerializer(products, many=True)
+    shop = request.shop
+    version, variant, etag = catalog_variant(request, shop)
 
-    log_action(
-        request,
-        action='VIEW',
-        model='Product',
-        details={
-            'description': f"{user.username} viewed homepage for {shop.name}",
-            'shop_id': shop.id,
-            'product_count': products.count(),
-            'context': 'homepage'
-        }
-    )
+    if catalog_cache.matches(request, etag):
+        log_action(request, action='VIEW', shop=shop, model='Product',
+                   details={**catalog_view_details(request, shop), 'not_modified': True})
+        return catalog_not_modified(etag)
+
+    cached = catalog_cache.load(shop.id, version, variant)
+    if cached is None:
+        cached = render_catalog(request, shop)
+        catalog_cache.store(shop.id, version, variant, cached)
+
+    count, content = cached
+    log_action(request, action='VIEW', shop=shop, model='Product',
+               details={**catalog_view_details(request, shop), 'product_count': count})
+    return catalog_response(content, etag)
+
+
+def catalog_variant(request, shop):
+    version = catalog_cache.get_version(shop.id)
+    variant = catalog_cache.variant_key(request.get_host(), sorted(request.query_params.lists()))
+    return version, variant, catalog_cache.etag(shop.id, version, variant)
+
+
+def catalog_fields(request):
+    return [f for f in request.query_params.get('fields', '').split(',') if f] or None
+
+
+def render_catalog(request, shop):
+    # (product count, JSON bytes) of the catalog as the request asks for it
+    products = product_values(Product.objects.filter(shop=shop).order_by('id'))
+
+    paginator = None
+    if 'page' in request.query_params:
+        paginator = ProductPagination()
+        products = paginator.paginate_queryset(products, request)
+
+    data = product_dicts(products, catalog_fields(request))
+    count = paginator.page.paginator.count if paginator else len(data)
+    if paginator:
+        data = paginator.get_paginated_response(data).data
+    return count, renderers.dumps(data)
+
+
+def catalog_view_details(request, shop):
+    return {
+        'description': f"{request.user.username} viewed homepage for {shop.name}",
+        'shop_id': shop.id,
+        'context': 'homepage'
+    }
+
+
+def catalog_not_modified(etag):
+    response = HttpResponseNotModified()
+    response['ETag'] = etag
+    return response
 
-    return Response(serializer.data)
+
+def catalog_response(content, etag):
+    response = HttpResponse(content, content_type='application/json')
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
 
     
 
 
+# Products created, updated or deleted since ?since=<cursor>; without a cursor
+# (or with one too old) the whole catalog comes back with "full": true
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def productChanges(request):
+    shop = request.shop
+    since = request.query_params.get("since")
+    changes = changes_since(shop, decode_sync_cursor(since) if since else None)
+
+    return Response({
+        "changed": product_dicts(product_values(changes["products"])),
+        "deleted": changes["deleted"],
+        "full": changes["full"],
+        "cursor": changes["cursor"],
+    })
+
+
+DASHBOARD_SECTIONS = ("shop", "sales", "categories", "catalog")
+
+
+# ✅ What a page needs on load in one request: shop info, sales totals,
+# categories and the catalog, or with ?since=<cursor> only its changes.
+# ?include=shop,sales,... picks sections. Without ?since the payload is
+# cached per shop under the catalog version, which every product change and
+# sale bumps, and If-None-Match with its ETag gets a 304.
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def dashboard(request):
+    user = request.user
+    shop = request.shop
+
+    include = [s for s in request.query_params.get("include", "").split(",") if s] or list(DASHBOARD_SECTIONS)
+    unknown = set(include) - set(DASHBOARD_SECTIONS)
+    if unknown:
+        raise ValidationError({"include": f"Unknown sections: {', '.join(sorted(unknown))}"})
+    since = request.query_params.get("since")
+    since = decode_sync_cursor(since) if since else None
+
+    log_action(request, action='VIEW', shop=shop, model='Dashboard', details={
+        'description': f"{user.username} viewed the dashboard for {shop.name}",
+        'shop_id': shop.id,
+        'sections': include,
+    })
+
+    cacheable = since is None
+    if cacheable:
+        # Daily totals roll over at midnight even when nothing was sold
+        version = catalog_cache.get_version(shop.id)
+        variant = catalog_cache.variant_key("dashboard", sorted(include), now().date())
+        etag = catalog_cache.etag(shop.id, version, variant)
+        if catalog_cache.matches(request, etag):
+            response = HttpResponseNotModified()
+            response['ETag'] = etag
+            return response
+        content = catalog_cache.load(shop.id, version, variant)
+    else:
+        content = None
+
+    if content is None:
+        data = {}
+        if "shop" in include:
+            data["shop"] = {"shop_id": shop.id, "shop_name": shop.name}
+        if "sales" in include:
+            data["sales"] = sales_totals(shop)
+        if "categories" in include:
+            data["categories"] = CategorySerializer(Category.objects.all(), many=True).data
+        if "catalog" in include:
+            changes = changes_since(shop, since)
+            data["catalog"] = {
+                "changed": product_dicts(product_values(changes["products"])),
+                "deleted": changes["deleted"],
+                "full": changes["full"],
+                "cursor": changes["cursor"],
+            }
+        content = renderers.dumps(data)
+        if cacheable:
+            catalog_cache.store(shop.id, version, variant, content)
+
+    response = HttpResponse(content, content_type='application/json')
+    if cacheable:
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])  
 def listCategories(request):
@@ -56,16 +209,19 @@ def listCategories(request):
 @permission_classes([IsAuthenticated, IsManager | IsStockClerk])
 def createProduct(request):
     user = request.user
-    shop = get_object_or_404(Shop, owner=user)
+    shop = request.shop
 
     serializer = ProductSerializer(data=request.data)
     if serializer.is_valid():
         product = serializer.save(shop=shop)
+        catalog_cache.invalidate(shop.id)
+        live.publish(shop.id, 'product', lambda: live_product(product.id))
 
         log_action(
             request,
             action='CREATE',
             user=user,
+            shop=shop,
             model='Product',
             object_id=str(product.id),
             details={
@@ -86,7 +242,7 @@ def createProduct(request):
 @api_view(["GET"])
 @permission_classes([IsAuthenticated, IsManager | IsStockClerk | IsSalesPerson])  
 def productDetail(request, product_id):
-    product = get_object_or_404(Product, id=product_id, shop__owner=request.user)
+    product = get_object_or_404(Product, id=product_id, shop=request.shop)
 
 
     if request.method == "GET":
@@ -98,14 +254,25 @@ def productDetail(request, product_id):
 @permission_classes([IsAuthenticated, IsManager | IsStockClerk])
 def editProduct(request, product_id):
     user = request.user
-    product = get_object_or_404(Product, id=product_id, shop__owner=user)
+    product = get_object_or_404(Product, id=product_id, shop=request.shop)
     
     # Capture old values before updating
     old_data = ProductSerializer(product).data
     
     serializer = ProductSerializer(product, data=request.data)
     if serializer.is_valid():
-        serializer.save()
+        with transaction.atomic():
+            serializer.save()
+            if product.shop_id != old_data['shop']:
+                # Moved to another shop: syncing clients of the old one must drop it
+                record_deletion(product, shop_id=old_data['shop'])
+                stock_alerts.move_to_shop(product)
+            stock_alerts.evaluate([product.id])
+        catalog_cache.invalidate(old_data['shop'])
+        catalog_cache.invalidate(product.shop_id)
+        if product.shop_id != old_data['shop']:
+            live.publish(old_data['shop'], 'product_deleted', lambda: {'id': product_id})
+        live.publish(product.shop_id, 'product', lambda: live_product(product_id))
 
         # Compare old and new values
         new_data = serializer.data
@@ -135,6 +302,7 @@ def editProduct(request, product_id):
             request,
             action='UPDATE',
             user=user,
+            shop=product.shop,
             model='Product',
             object_id=str(product_id),
             details={
@@ -153,12 +321,13 @@ def editProduct(request, product_id):
 @permission_classes([IsAuthenticated, IsManager | IsStockClerk])
 def deleteProduct(request, product_id):
     user = request.user
-    product = get_object_or_404(Product, id=product_id, shop__owner=request.user)
+    product = get_object_or_404(Product, id=product_id, shop=request.shop)
 
     log_action(
         request,
         action='DELETE',
         user=user,
+        shop=product.shop,
         model='Product',
         object_id=str(product_id),
         details={
@@ -169,7 +338,11 @@ def deleteProduct(request, product_id):
         }
     )
 
-    product.delete()
+    with transaction.atomic():
+        record_deletion(product)
+        product.delete()
+    catalog_cache.invalidate(product.shop_id)
+    live.publish(product.shop_id, 'product_deleted', lambda: {'id': product_id})
     return Response({"message": "Product deleted"}, status=status.HTTP_204_NO_CONTENT)
 
 
@@ -178,87 +351,112 @@ def deleteProduct(request, product_id):
 @permission_classes([IsAuthenticated, IsManager | IsSalesPerson])
 def recordSale(request):
     user = request.user
-    shop = get_object_or_404(Shop, owner=user)
+    shop = request.shop
     sales_data = request.data.get("sales", [])
 
     if not sales_data:
         return Response({"error": "No sales data provided"}, status=status.HTTP_400_BAD_REQUEST)
 
-    response_data = []
-    for sale in sales_data:
-        product_id = sale.get("product_id")
-        quantity = sale.get("quantity")
+    try:
+        sales = checkout(request, shop, sales_data)
+    except CheckoutError as e:
+        return Response({"error": str(e)}, status=e.status_code)
+
+    response_data = SaleSerializer(sales, many=True).data
+    live.publish(shop.id, 'sale', lambda: {
+        'sales': response_data,
+        'stock': live_stock(sale.product_id for sale in sales),
+        'totals': sales_totals(shop),
+    })
+    return Response(response_data, status=status.HTTP_201_CREATED)
 
-        if not product_id or not quantity:
-            return Response({"error": "Product ID and quantity are required"}, status=status.HTTP_400_BAD_REQUEST)
 
-        product = get_object_or_404(Product, id=product_id, shop=shop)
-        sale_data = {
-            "shop": shop.id,
-            "product": product_id,
-            "quantity_sold": quantity,
-            "total_price": Decimal(quantity) * product.price
-        }
+# Payloads of the live events (inventory/utils/live.py), built after commit
+# and only when the shop has clients listening
+def live_product(product_id):
+    rows = product_dicts(product_values(Product.objects.filter(pk=product_id)))
+    return rows[0] if rows else {'id': product_id}
 
-        serializer = SaleSerializer(data=sale_data)
-        if serializer.is_valid():
-            sale_instance = serializer.save()
-
-            log_action(
-                request,
-                action='SALE',
-                user=user,
-                model='Sale',
-                object_id=str(sale_instance.id),
-                details={
-                    'description': f"{user.username} sold {quantity} of {product.name} for {shop.name}",
-                    'product_name': product.name,
-                    'quantity': quantity,
-                    'total_price': str(sale_instance.total_price),
-                    'shop': shop.name
-                }
-            )
-
-            response_data.append(serializer.data)
-        else:
-            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-    return Response(response_data, status=status.HTTP_201_CREATED)
+def live_stock(product_ids):
+    return list(Product.objects.filter(pk__in=set(product_ids)).values('id', 'quantity'))
 
 
 
 @api_view(['GET'])
 def salesCount(request):
-    shop = get_object_or_404(Shop, owner=request.user)
-    today = now().date()
-    week_start = today - timedelta(days=today.weekday())
-    month_start = today.replace(day=1)
-
-    daily_sales = Sale.objects.filter(
-        created_at__date=today,
-        product__shop=shop
-    ).aggregate(total=Sum('total_price'))['total'] or 0
-
-    weekly_sales = Sale.objects.filter(
-        created_at__date__gte=week_start,
-        product__shop=shop
-    ).aggregate(total=Sum('total_price'))['total'] or 0
-
-    monthly_sales = Sale.objects.filter(
-        created_at__date__gte=month_start,
-        product__shop=shop
-    ).aggregate(total=Sum('total_price'))['total'] or 0
+    shop = request.shop
+    return Response(sales_totals(shop))
+
+
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def salesSeries(request):
+    # ?interval=hour|day|week|month&since=&until=&group_by=product|category
+    shop = request.shop
+    params = request.query_params
+
+    interval = params.get("interval", "day")
+    if interval not in INTERVALS:
+        raise ValidationError({"interval": f"Must be one of {', '.join(INTERVALS)}"})
+    group_by = params.get("group_by")
+    if group_by and group_by not in GROUPS:
+        raise ValidationError({"group_by": f"Must be one of {', '.join(GROUPS)}"})
+
+    until = parse_datetime_param(request, "until") or now()
+    since = parse_datetime_param(request, "since") or until - 30 * INTERVALS[interval]
+    if since >= until:
+        raise ValidationError({"since": "Must be before until"})
+    if (until - since) / INTERVALS[interval] > MAX_BUCKETS:
+        raise ValidationError({"interval": f"Range covers more than {MAX_BUCKETS} buckets; use a wider interval"})
 
     return Response({
-        "daily_sales": daily_sales,
-        "weekly_sales": weekly_sales,
-        "monthly_sales": monthly_sales
+        "interval": interval,
+        "since": since,
+        "until": until,
+        "results": sales_series(shop, interval, since, until, group_by),
     })
 
 
 
 
+# ✅ Products at or below their alert threshold, lowest stock first
+@api_view(["GET"])
+@permission_classes([IsAuthenticated, IsManager | IsStockClerk])
+def stockAlerts(request):
+    return Response([
+        {
+            "product_id": alert.product_id,
+            "product_name": alert.product.name,
+            "quantity": alert.product.quantity,
+            "threshold": alert.threshold,
+        }
+        for alert in stock_alerts.alerted(request.shop)
+    ])
+
+
+# ✅ Reorder suggestions from the last compute_replenishment run
+@api_view(["GET"])
+@permission_classes([IsAuthenticated, IsManager | IsStockClerk])
+def replenishmentSuggestions(request):
+    return Response([
+        {
+            "product_id": suggestion.product_id,
+            "product_name": suggestion.product.name,
+            "quantity": suggestion.product.quantity,
+            "avg_daily_units": suggestion.avg_daily_units,
+            "days_of_cover": suggestion.days_of_cover,
+            "reorder_quantity": suggestion.reorder_quantity,
+            "computed_at": suggestion.computed_at,
+        }
+        for suggestion in replenishment.suggestions(request.shop)
+    ])
+
+
 @api_view(["POST"])
+@authentication_classes([])  # a stale or expired token must not block logging in again
 def loginView(request):
     username = request.data.get("username")
     password = request.data.get("password")
@@ -269,19 +467,22 @@ def loginView(request):
     user = authenticate(username=username, password=password)
 
     if user:
-        token, _ = Token.objects.get_or_create(user=user)
-        group_name = user.groups.first().name if user.groups.exists() else None
+        token, created = Token.objects.get_or_create(user=user)
+        if not created:
+            touch_token(token)
+        roles = user_roles(user)
+        group_name = roles[0] if roles else None
 
-        try:
-            shop = Shop.objects.get(owner=user)
-            shop_name = shop.name
-        except Shop.DoesNotExist:
-            shop_name = None
+        # Owners of several shops choose one per request with X-Shop-Id
+        shops = owned_shops(user)
+        shop = shops[0] if len(shops) == 1 else None
+        shop_name = shop.name if shop else None
 
         log_action(
             request,
             action='LOGIN',
             user=user,  # Explicitly pass the authenticated user
+            shop=shop,
             details={
                 'description': f"{username} logged in",  # Add description
                 'username': username,
@@ -296,7 +497,8 @@ def loginView(request):
             "shop_name": shop_name,
             "first_name": user.first_name,
             "last_name": user.last_name,
-            "role": group_name
+            "role": group_name,
+            "shops": [{"shop_id": s.id, "shop_name": s.name} for s in shops]
         })
     else:
         return Response({"error": "Invalid credentials"}, status=401)
@@ -320,7 +522,7 @@ def logoutView(request):
 def getShopInfo(request):
     try:
         # Get the shop associated with the logged-in user
-        shop = get_object_or_404(Shop, owner=request.user)
+        shop = request.shop
         
         # Return the shop ID and name
         return Response({
@@ -334,11 +536,110 @@ def getShopInfo(request):
 
 
 
+def parse_datetime_param(request, param):
+    if not request.query_params.get(param):
+        return None
+    try:
+        # None when malformed, ValueError for impossible dates like Feb 30
+        value = parse_datetime(request.query_params[param])
+    except ValueError:
+        value = None
+    if value is None:
+        raise ValidationError({param: "Must be an ISO 8601 datetime"})
+    return make_aware(value) if is_naive(value) else value
+
+
+def filter_time_range(request, queryset, field):
+    # ?since= (inclusive) and ?until= (exclusive) as ISO 8601 datetimes
+    for param, lookup in (("since", "gte"), ("until", "lt")):
+        value = parse_datetime_param(request, param)
+        if value is not None:
+            queryset = queryset.filter(**{f"{field}__{lookup}": value})
+    return queryset
+
+
+def audit_log_shop(request):
+    # Audit logs are only read for a shop the user owns: ?shop= picks one,
+    # otherwise it is the request's shop (see utils/shops.py)
+    requested = request.query_params.get("shop")
+    if not requested:
+        return resolve_shop(request)
+    try:
+        shop_id = int(requested)
+    except ValueError:
+        raise ValidationError({"shop": "Must be an integer"})
+    for shop in owned_shops(request.user):
+        if shop.id == shop_id:
+            return shop
+    raise Http404("No such shop for the logged-in user")
+
+
+def filter_audit_logs(request, logs):
+    # Filters shared by the audit log list and export endpoints
+    params = request.query_params
+    logs = logs.filter(shop=audit_log_shop(request))
+    if params.get("user"):
+        try:
+            logs = logs.filter(user_id=int(params["user"]))
+        except ValueError:
+            raise ValidationError({"user": "Must be an integer"})
+    for param in ("action", "model"):
+        if params.get(param):
+            logs = logs.filter(**{param: params[param]})
+    return filter_time_range(request, logs, "timestamp")
+
+
 @api_view(["GET"])
 @permission_classes([IsAuthenticated, IsManager])  # Restrict to managers only
 def auditLogList(request):
-    # Fetch all logs, ordered by timestamp (most recent first)
-    logs = AuditLog.objects.all().order_by('-timestamp')
-    
-    serializer = AuditLogSerializer(logs, many=True)
-    return Response(serializer.data)
\ No newline at end of file
+    # Most recent first, one keyset page at a time (?cursor=, ?page_size=)
+    logs = filter_audit_logs(request, audit_log_values(AuditLog.objects.all()))
+    logs, next_url = keyset_page(request, logs)
+
+    return Response({"results": audit_log_dicts(logs), "next": next_url})
+
+
+
+def export_response(request, queryset, fields, name):
+    fmt = request.query_params.get("output", "ndjson")
+    if fmt not in FORMATS:
+        raise ValidationError({"output": f"Must be one of {', '.join(FORMATS)}"})
+    compress = request.query_params.get("gzip") in ("1", "true")
+
+    filename = f"{name}-{now():%Y%m%d%H%M%S}.{fmt}" + (".gz" if compress else "")
+    response = StreamingHttpResponse(
+        export_chunks(queryset, fields, fmt, compress),
+        content_type="application/gzip" if compress else FORMATS[fmt],
+    )
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated, IsManager])
+def exportAuditLogs(request):
+    # Streams every matching audit entry of the shop (?output=ndjson|csv, ?gzip=1)
+    logs = filter_audit_logs(request, AuditLog.objects.all())
+    return export_response(request, logs, AUDIT_LOG_FIELDS, "audit-logs")
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated, IsManager])
+def exportSales(request):
+    shop = request.shop
+    sales = filter_time_range(request, Sale.objects.filter(shop=shop), "created_at")
+    return export_response(request, sales, SALE_FIELDS, "sales")
+
+
+# ✅ Prometheus scrape endpoint for PerformanceMiddleware's histograms
+# Fails closed: without METRICS_TOKEN the endpoint does not exist, except
+# under DEBUG, since it shows every view's traffic and timings
+@require_GET
+def metricsView(request):
+    token = getattr(settings, "METRICS_TOKEN", None)
+    if not token:
+        if not settings.DEBUG:
+            return HttpResponse(status=404)
+    elif not constant_time_compare(request.headers.get("Authorization", ""), f"Bearer {token}"):
+        return HttpResponse(status=401)
+    return HttpResponse(registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
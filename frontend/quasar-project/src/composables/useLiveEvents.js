@@ -0,0 +1,72 @@
+// src/composables/useLiveEvents.js
+// Live sale and product updates for the logged-in shop, streamed from
+// /api/live/ as server-sent events. EventSource cannot send the token header,
+// so the stream is read with fetch. The server closes streams every few
+// minutes; after any reconnect `onResync` runs, since events may have been
+// missed while disconnected. Servers without streaming (sync workers) answer
+// 204, and `connected` then stays false so pages keep fetching.
+import { ref, onUnmounted } from 'vue'
+import { api } from 'src/boot/axios'
+
+export function useLiveEvents(handlers, { onResync } = {}) {
+  const connected = ref(false)
+  let controller = null
+  let stopped = false
+  let retryDelay = 3000
+
+  const dispatch = (block) => {
+    let type = 'message'
+    const data = []
+    for (const line of block.split('\n')) {
+      if (line.startsWith('event:')) type = line.slice(6).trim()
+      else if (line.startsWith('data:')) data.push(line.slice(5).trimStart())
+      else if (line.startsWith('retry:')) retryDelay = Number(line.slice(6)) || retryDelay
+    }
+    if (!data.length) return
+    if (type === 'resync') {
+      onResync?.()
+    } else {
+      handlers[type]?.(JSON.parse(data.join('\n')))
+    }
+  }
+
+  const connect = async (reconnecting = false) => {
+    controller = new AbortController()
+    try {
+      const response = await fetch(new URL('live/', new URL(api.defaults.baseURL, window.location.href)), {
+        headers: { Authorization: `Token ${localStorage.getItem('token')}`, Accept: 'text/event-stream' },
+        signal: controller.signal,
+      })
+      if ([204, 401, 403].includes(response.status)) return
+      if (!response.ok) throw new Error(`Live updates unavailable (${response.status})`)
+
+      connected.value = true
+      if (reconnecting) onResync?.()
+
+      const reader = response.body.pipeThrough(new TextDecoderStream()).getReader()
+      let buffer = ''
+      for (;;) {
+        const { value, done } = await reader.read()
+        if (done) break
+        buffer += value
+        const blocks = buffer.split('\n\n')
+        buffer = blocks.pop()
+        blocks.forEach(dispatch)
+      }
+    } catch (error) {
+      if (error.name !== 'AbortError') console.error('Live updates disconnected:', error)
+    } finally {
+      connected.value = false
+    }
+    if (!stopped) setTimeout(() => connect(true), retryDelay)
+  }
+
+  const stop = () => {
+    stopped = true
+    controller?.abort()
+  }
+
+  connect()
+  onUnmounted(stop)
+  return { connected, stop }
+}